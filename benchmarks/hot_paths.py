@@ -0,0 +1,280 @@
+# Benchmarks for the model's hot paths at a range of population sizes.
+# For each benchmark and population size we record the wall time (best of several repeats), the number of people
+# processed per second, and the peak memory allocated while running (measured with tracemalloc, which also sees
+# NumPy's arrays). Results are written as JSON so they can be saved as a baseline and compared against later.
+#
+# Everything here uses only the standard library and the packages the model already needs, so it runs offline.
+#
+# Examples:
+#   python benchmarks/hot_paths.py                                  # run everything and print a table
+#   python benchmarks/hot_paths.py --sizes 1e3,1e5 --only update    # a quick run of one benchmark
+#   python benchmarks/hot_paths.py --save baseline.json             # save the results as a baseline
+#   python benchmarks/hot_paths.py --compare baseline.json          # flag regressions against a saved baseline
+
+import argparse
+import contextlib
+import datetime
+import gc
+import importlib.util
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_root, "week03"))
+sys.path.insert(0, os.path.join(repo_root, "week02"))
+
+
+def load_script(path):
+    """Import one of the example scripts by file name (some of them, like 02_functions.py, are not valid module
+    names), hiding whatever it prints when it runs."""
+    name = os.path.splitext(os.path.basename(path))[0].lstrip("0123456789_")
+    spec = importlib.util.spec_from_file_location(name, os.path.join(repo_root, path))
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spec.loader.exec_module(module)
+    return module
+
+
+# Each benchmark takes a population size, does any setup which should not be timed, and returns a function which runs
+# the code being measured once. Benchmarks of scalar (one person at a time) functions are slow at large sizes, so each
+# benchmark also has a largest size it will be run at.
+def bench_initialise_population(size):
+    from infection_toy_model import initialise_population
+    return lambda: initialise_population(size)
+
+
+def bench_update(size):
+    from infection_toy_model import initialise_population, update
+    population = initialise_population(size)
+    return lambda: update(population, 1)
+
+
+def bench_summarise(size):
+    from infection_toy_model import initialise_population, summarise
+    population = initialise_population(size)
+    return lambda: summarise(population)
+
+
+def bench_mean_field_batch(size):
+    # The mean-field model for `size` parameter points at once
+    from mean_field_model import mean_field_batch
+    rate = np.random.uniform(0.05, 0.4, size)
+    contact_number = np.random.uniform(2, 12, size)
+    return lambda: mean_field_batch(1000, rate, 2, contact_number, 20)
+
+
+def bench_gen_ages(size):
+    from age_distribution_example import ContinuousAgeDistribution
+    age_dist = ContinuousAgeDistribution.select_model(1)
+    age_dist.sampler()  # build the cached sampler here, so that it is not counted in the first repeat
+    return lambda: age_dist.gen_ages(size)
+
+
+def bench_gen_ages_guide(size):
+    from age_distribution_example import ContinuousAgeDistribution
+    age_dist = ContinuousAgeDistribution.select_model(1)
+    age_dist.sampler("guide")  # build the cached sampler here, so that it is not counted in the first repeat
+    return lambda: age_dist.gen_ages(size, engine="guide")
+
+
+def bench_gen_rred_p(size):
+    risk_reduction = load_script("week02/risk_reduction.py")
+    p_rred_p = np.random.choice([0.3, 0.5, 0.7], size=size)
+    return lambda: risk_reduction.gen_rred_p(p_rred_p)
+
+
+def bench_calc_risk_reduction(size):
+    risk_reduction = load_script("week02/risk_reduction.py")
+    p_rred_p = np.random.choice([0.3, 0.5, 0.7], size=size)
+    newp_factor = np.random.choice([0.5, 1, 2], size=size)
+    rred_a = np.random.uniform(0.1, 1.5, size=size)
+    return lambda: risk_reduction.calc_risk_reduction(p_rred_p, newp_factor, rred_a, 1)
+
+
+def bench_calc_risk_reduction_into(size):
+    # The fused version, with the output and work arrays allocated beforehand as they would be in a simulation
+    risk_reduction = load_script("week02/risk_reduction.py")
+    p_rred_p = np.random.choice([0.3, 0.5, 0.7], size=size)
+    newp_factor = np.random.choice([0.5, 1, 2], size=size)
+    rred_a = np.random.uniform(0.1, 1.5, size=size)
+    out = np.empty(size)
+    scratch = risk_reduction.ScratchArena()
+    rng = np.random.default_rng()
+    risk_reduction.calc_risk_reduction_into(p_rred_p, newp_factor, rred_a, 1, out=out, scratch=scratch, rng=rng)
+    return lambda: risk_reduction.calc_risk_reduction_into(p_rred_p, newp_factor, rred_a, 1, out=out, scratch=scratch,
+                                                           rng=rng)
+
+
+def bench_calc_eprate(size):
+    # calc_eprate from week01, given a normal sample and age group for each person
+    functions = load_script("week01/02_functions.py")
+    n = np.random.normal(size=size).tolist()
+    age_group = np.random.randint(1, 6, size=size).tolist()
+    return lambda: [functions.calc_eprate(n[i], age_group[i]) for i in range(size)]
+
+
+def bench_calc_eprate_sampled(size):
+    # calc_eprate from week02, which also draws the normal sample for each person
+    random_numbers = load_script("week02/random_numbers.py")
+    age_group = np.random.randint(1, 6, size=size).tolist()
+    return lambda: [random_numbers.calc_eprate(a) for a in age_group]
+
+
+def bench_calc_eprate_array(size):
+    functions = load_script("week01/02_functions.py")
+    n = np.random.normal(size=size)
+    age_group = np.random.randint(1, 6, size=size)
+    return lambda: functions.calc_eprate_array(n, age_group)
+
+
+def bench_calc_eprate_sampled_array(size):
+    random_numbers = load_script("week02/random_numbers.py")
+    age_group = np.random.randint(1, 6, size=size)
+    return lambda: random_numbers.calc_eprate_array(age_group)
+
+
+def bench_probability_death_array(size):
+    functions = load_script("week01/02_functions.py")
+    death_rate = np.random.uniform(0.001, 0.1, size=size)
+    return lambda: functions.probability_death_array(death_rate, 0.25)
+
+
+benchmarks = {
+    "initialise_population": (bench_initialise_population, 10**7),
+    "update": (bench_update, 10**7),
+    "summarise": (bench_summarise, 10**7),
+    "mean_field_batch": (bench_mean_field_batch, 10**5),
+    "gen_ages": (bench_gen_ages, 10**7),
+    "gen_ages_guide": (bench_gen_ages_guide, 10**7),
+    "gen_rred_p": (bench_gen_rred_p, 10**7),
+    "calc_risk_reduction": (bench_calc_risk_reduction, 10**7),
+    "calc_risk_reduction_into": (bench_calc_risk_reduction_into, 10**7),
+    "calc_eprate": (bench_calc_eprate, 10**6),
+    "calc_eprate_sampled": (bench_calc_eprate_sampled, 10**6),
+    "calc_eprate_array": (bench_calc_eprate_array, 10**7),
+    "calc_eprate_sampled_array": (bench_calc_eprate_sampled_array, 10**7),
+    "probability_death_array": (bench_probability_death_array, 10**7),
+}
+
+default_sizes = [10**3, 10**4, 10**5, 10**6, 10**7]
+
+
+def measure(setup, size, repeats):
+    """Time a benchmark at one size, returning its result record."""
+    wall_times = []
+    for _ in range(repeats):
+        run = setup(size)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        wall_times.append(time.perf_counter() - start)
+        del run
+
+    # Peak memory is measured on a separate run, as tracemalloc slows the code down
+    run = setup(size)
+    gc.collect()
+    tracemalloc.start()
+    run()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall_time = min(wall_times)
+    return {
+        "size": size,
+        "wall_time": wall_time,
+        "people_per_second": size / wall_time if wall_time > 0 else float("inf"),
+        "peak_memory": peak_memory,
+    }
+
+
+def run_benchmarks(names, sizes, repeats=3):
+    """Run the named benchmarks at each size (up to each benchmark's largest size), returning a results dictionary."""
+    results = {
+        "metadata": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "repeats": repeats,
+        },
+        "benchmarks": {},
+    }
+    for name in names:
+        setup, max_size = benchmarks[name]
+        records = []
+        for size in sizes:
+            if size > max_size:
+                continue
+            record = measure(setup, size, repeats)
+            records.append(record)
+            print(f"{name:>24} {size:>10,d} {record['wall_time']:>12.6f} s {record['people_per_second']:>16,.0f} /s"
+                  f" {record['peak_memory'] / 2**20:>10.1f} MiB", flush=True)
+        results["benchmarks"][name] = records
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """Compare wall times with a baseline, returning a message for each benchmark and size which got slower by
+    more than the tolerance (0.2 means 20% slower)."""
+    regressions = []
+    for name, records in results["benchmarks"].items():
+        baseline_times = {record["size"]: record["wall_time"] for record in baseline["benchmarks"].get(name, [])}
+        for record in records:
+            baseline_time = baseline_times.get(record["size"])
+            if baseline_time and record["wall_time"] > baseline_time * (1 + tolerance):
+                regressions.append(f"{name} at size {record['size']:,d}: {record['wall_time']:.6f} s "
+                                   f"(baseline {baseline_time:.6f} s, {record['wall_time'] / baseline_time:.2f}x)")
+    return regressions
+
+
+def parse_sizes(text):
+    return [int(float(size)) for size in text.split(",")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model's hot paths across population sizes.")
+    parser.add_argument("--sizes", type=parse_sizes, default=default_sizes,
+                        help="comma separated population sizes, e.g. 1e3,1e4,1e5")
+    parser.add_argument("--only", help="comma separated names of the benchmarks to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=3, help="number of timed runs; the best one is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--save", metavar="BASELINE", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slow-down before a result counts as a regression (default 0.2, i.e. 20%%)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(benchmarks)
+    unknown = [name for name in names if name not in benchmarks]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)} (choose from {', '.join(benchmarks)})")
+
+    results = run_benchmarks(names, args.sizes, args.repeats)
+
+    for filename in (args.output, args.save):
+        if filename:
+            with open(filename, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print("\nRegressions against", args.compare)
+            for regression in regressions:
+                print("  ", regression)
+            return 1
+        print("\nNo regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# Benchmark of how much memory each Person object takes.
+# Code which uses the Person API keeps lists of Person objects, so their size decides how many people fit in memory.
+# This script creates many Person objects in three ways and reports the bytes per person (measured with tracemalloc,
+# which also sees NumPy's arrays):
+# - "standalone": Person(), which holds its own values in __slots__ with its yes/no attributes packed into one integer
+# - "own population": Person(Population(1)), a view of a population of size one (what Person() used to create)
+# - "view": population[i], a view of one row of a large population (the population's columns are not counted)
+#
+# Examples:
+#   python benchmarks/person_memory.py                     # 100,000 people of each kind
+#   python benchmarks/person_memory.py --people 5000000    # check that 5 million standalone people fit
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_root, "week03"))
+
+from infection_toy_model import Person, Population  # noqa: E402
+
+
+def bytes_per_person(make_people, n):
+    """Create a list of n people with make_people(n), returning the memory it took per person."""
+    gc.collect()
+    tracemalloc.start()
+    people = make_people(n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del people
+    return current / n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the memory taken by each Person object.")
+    parser.add_argument("--people", type=int, default=100_000, help="number of standalone people and views to create")
+    parser.add_argument("--own-population", type=int, default=10_000,
+                        help="number of people with a population of their own to create (these are much larger)")
+    args = parser.parse_args(argv)
+
+    population = Population(args.people)
+    kinds = {
+        "standalone": (lambda n: [Person() for _ in range(n)], args.people),
+        "own population": (lambda n: [Person(Population(1)) for _ in range(n)], args.own_population),
+        "view": (lambda n: [population[i] for i in range(n)], args.people),
+    }
+    for kind, (make_people, n) in kinds.items():
+        size = bytes_per_person(make_people, n)
+        print(f"{kind:>15} {size:>9.0f} bytes per person  ({size * 5e6 / 2**20:,.0f} MiB for 5 million)")
+
+
+if __name__ == "__main__":
+    main()
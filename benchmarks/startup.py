@@ -0,0 +1,103 @@
+# Benchmark of how long it takes to import the model code in a fresh Python process.
+# Every worker process in an ensemble (see week03/ensemble_runner.py) pays this cost before doing any work, so the
+# model code should only need NumPy to import: matplotlib and scipy are loaded on first use instead. This script
+# imports each module in a new interpreter, records the best import time, and fails if any of the heavy packages got
+# imported or if an import got slower than a saved baseline.
+#
+# Examples:
+#   python benchmarks/startup.py                         # print import times
+#   python benchmarks/startup.py --save startup.json     # save them as a baseline
+#   python benchmarks/startup.py --compare startup.json  # check against a saved baseline
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+week03 = os.path.join(repo_root, "week03")
+
+# The modules which should import with NumPy alone
+modules = [
+    "infection_toy_model",
+    "output_class_example",
+    "class_exercise",
+    "age_distribution_example",
+    "config_class_example",
+    "ensemble_runner",
+    "instrumentation",
+    "result_cache",
+    "streaming_output",
+    "ensemble_summary",
+    "mean_field_model",
+]
+
+# Packages which must not be imported by just importing the modules above
+heavy_packages = ["matplotlib", "scipy", "pandas"]
+
+# Run in the child process: time the import, then list any heavy packages it pulled in
+probe = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_time": elapsed, "heavy_imports": [name for name in {heavy} if name in sys.modules]}}))
+"""
+
+
+def measure(module, repeats):
+    """Import `module` in `repeats` fresh interpreters, returning the best time and any heavy packages imported."""
+    best = None
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-c", probe.format(module=module, heavy=heavy_packages)],
+            cwd=week03, capture_output=True, text=True, check=True,
+        )
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        if best is None or result["import_time"] < best["import_time"]:
+            best = result
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark import time of the model code in a fresh process.")
+    parser.add_argument("--repeats", type=int, default=5, help="number of fresh processes per module")
+    parser.add_argument("--save", metavar="BASELINE", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a saved baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slow-down before a result counts as a regression (default 0.5, i.e. 50%%)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    problems = []
+    for module in modules:
+        result = measure(module, args.repeats)
+        results[module] = result
+        print(f"{module:>26} {result['import_time'] * 1000:>9.1f} ms  {', '.join(result['heavy_imports'])}")
+        if result["heavy_imports"]:
+            problems.append(f"{module} imports {', '.join(result['heavy_imports'])}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for module, result in results.items():
+            baseline_time = baseline.get(module, {}).get("import_time")
+            if baseline_time and result["import_time"] > baseline_time * (1 + args.tolerance):
+                problems.append(f"{module}: {result['import_time'] * 1000:.1f} ms "
+                                f"(baseline {baseline_time * 1000:.1f} ms)")
+
+    if problems:
+        print("\nStartup regressions:")
+        for problem in problems:
+            print("  ", problem)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
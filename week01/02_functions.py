@@ -1,5 +1,7 @@
 import math
 
+import numpy as np
+
 
 # We can define functionality in line as follows...
 death_rate = 0.05
@@ -21,6 +23,22 @@ prob_dying = probability_death(death_rate, period)
 print("Probability of dying = ", probability_death(death_rate, period))
 
 
+# For a whole population we can give the function arrays of death rates instead, and get back an array of
+# probabilities, one for each person. np.expm1(x) calculates exp(x) - 1 directly, which is more accurate than
+# 1 - exp(-x) when the rate times the period is small (1 - exp(-x) loses most of its significant digits then), so the
+# results can differ very slightly from probability_death.
+def probability_death_array(death_rate, period):
+    """Get the probability of dying for arrays of death rates per year and/or periods of time in years"""
+    return -np.expm1(-np.asarray(death_rate) * period)
+
+
+# Even when the same few death rates come up every time step, it isn't worth remembering the answers for each rate:
+# finding the distinct rates in an array (e.g. with np.unique) takes several times longer than just calculating
+# expm1 for every person.
+death_rates = np.array([0.05, 0.01, 0.2])
+print("Probabilities of dying = ", probability_death_array(death_rates, period))
+
+
 # How can we write a function to calculate the eprate? [Eq. 2, section 3.2.1 in Model Details]
 # (Assuming a sample has already been taken from a Normal distribution N(0,1))
 # def calc_eprate(...):
@@ -37,3 +55,20 @@ def calc_eprate(n, age_group):
 eprate = calc_eprate(n, age_group)
 
 print("eprate =", eprate)
+
+
+# The same calculation for arrays of samples and age groups, one entry per person, all at once
+def calc_eprate_array(n, age_group):
+    """ the rate of starting to have a long term condomless sex partner (ep=1), for arrays of n and age_group"""
+    return np.exp(0.25*np.asarray(n)) / age_group
+
+
+n_array = np.random.normal(size=5)
+age_group_array = np.random.randint(1, 6, size=5)
+eprate_array = calc_eprate_array(n_array, age_group_array)
+print("eprates =", eprate_array)
+
+# This gives the same results as calc_eprate for each person, except that NumPy's exp can round the last digit
+# differently from math.exp
+eprate_scalar = [calc_eprate(n_i, a_i) for n_i, a_i in zip(n_array, age_group_array)]
+print("Same as calc_eprate?", np.allclose(eprate_array, eprate_scalar, rtol=1e-15, atol=0))
@@ -1,5 +1,8 @@
 import math
 
+import numpy as np
+
+from piecewise_rules import PiecewiseRule
 
 def prob_start_sex_work(age, ever_sw, life_sex_risk, rred_rc):
     """Compute the probability of a woman becoming a sex worker.
@@ -85,3 +88,49 @@ print('d_epdiag', d_epdiag)
 print('epdiag_tm1', epdiag_tm1)
 print('epdiag', epdiag)
 
+
+# The functions above work on one person at a time. To apply them to a whole population we can write versions which
+# take arrays (one element per person), using a PiecewiseRule (see piecewise_rules.py) for each if/elif ladder over
+# bands. These give exactly the same values as the functions above.
+
+# Age factor for starting sex work; outside the age bands the probability is 0
+sw_age_factor = PiecewiseRule(edges=[15, 20, 25, 35, 50], values=[1, 1, 0.3, 0.03])
+
+
+def prob_start_sex_work_array(age, ever_sw, life_sex_risk, rred_rc):
+    """Array version of prob_start_sex_work: each argument can be an array with one element per woman."""
+    base_rate_sw = 0.0020
+    life_sex_risk = np.asarray(life_sex_risk)
+
+    risk_factor = np.select([life_sex_risk == 3, life_sex_risk >= 2], [3, 1], default=0)
+    base_prob = base_rate_sw * np.sqrt(rred_rc)
+    prob = base_prob * sw_age_factor(age) * risk_factor
+    prob = np.where(ever_sw, prob * 10, prob)
+    return np.minimum(prob, 1)
+
+
+# For the long term partner we look up what to divide p_diag by; dividing by infinity gives 0 when d_epdiag < 0
+epdiag_divisor = PiecewiseRule(edges=[0, 0.05, 0.1], values=[5, 2], below=np.inf, above=1)
+
+
+def prob_long_term_partner_diagnosed_array(d_epdiag, p_diag):
+    """Array version of prob_long_term_partner_diagnosed."""
+    return p_diag / epdiag_divisor(d_epdiag)
+
+
+# Check that the array versions agree with the originals for lots of random people
+rng = np.random.default_rng()
+ages = rng.uniform(10, 60, size=1000)
+ever_sws = rng.choice([True, False], size=1000)
+life_sex_risks = rng.choice([1, 2, 3], size=1000)
+rred_rcs = rng.uniform(0.1, 2, size=1000)
+sw_probs = prob_start_sex_work_array(ages, ever_sws, life_sex_risks, rred_rcs)
+print("Array version of prob_start_sex_work matches?", all(
+    sw_probs[i] == prob_start_sex_work(ages[i], ever_sws[i], life_sex_risks[i], rred_rcs[i]) for i in range(1000)
+))
+
+d_epdiags = rng.uniform(-0.1, 0.2, size=1000)
+diag_probs = prob_long_term_partner_diagnosed_array(d_epdiags, p_diag)
+print("Array version of prob_long_term_partner_diagnosed matches?", all(
+    diag_probs[i] == prob_long_term_partner_diagnosed(d_epdiags[i], p_diag) for i in range(1000)
+))
@@ -0,0 +1,31 @@
+# Many of the model's rules are "piecewise": the value depends on which band a variable falls in, for example an age
+# factor which is 1 between 15 and 25, 0.3 between 25 and 35, and so on. Written as if/elif ladders (see
+# 03_conditional.py) these are easy to read, but they can only handle one person at a time.
+# A PiecewiseRule describes the same thing as a table - the band edges and the value in each band - so that it can be
+# looked up for a whole array of people at once with np.searchsorted.
+
+import numpy as np
+
+
+class PiecewiseRule:
+    """A value which depends on which band a variable x falls in.
+
+    Band i covers edges[i] <= x < edges[i+1] and has value values[i]. Values of x below the first edge get `below`,
+    and values at or above the last edge get `above`.
+    """
+
+    def __init__(self, edges, values, below=0, above=0):
+        self.edges = np.asarray(edges)
+        if len(values) != len(self.edges) - 1:
+            raise ValueError("A piecewise rule needs one value for each band between consecutive edges")
+        if np.any(np.diff(self.edges) <= 0):
+            raise ValueError("Band edges must be strictly increasing")
+        # The table has the `below` value first and the `above` value last, so it lines up with band() below
+        self.table = np.array([below, *values, above])
+
+    def band(self, x):
+        """Index into self.table for each x: 0 is below the first edge, len(self.edges) is above the last one."""
+        return np.searchsorted(self.edges, x, side="right")
+
+    def __call__(self, x):
+        return self.table[self.band(x)]
@@ -54,3 +54,17 @@ def calc_eprate(a):
     r = rng.normal()
     eprate = (0.1 * math.exp(r/4)) / a
     return eprate
+
+
+# For a whole population, we can draw all of the normal samples in one call instead of one per person.
+# rng.normal(size=n) gives the same numbers as calling rng.normal() n times, so for the same random number generator
+# this matches calling calc_eprate for each person in turn (up to NumPy's exp rounding the last digit differently
+# from math.exp).
+def calc_eprate_array(a):
+    r = rng.normal(size=len(a))
+    eprate = (0.1 * np.exp(r/4)) / a
+    return eprate
+
+
+age_groups = rng.integers(1, 6, size=10)
+print("eprates:", calc_eprate_array(age_groups))
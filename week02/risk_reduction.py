@@ -14,15 +14,87 @@ rred_initial = 1  # since this is a constant we don't need this to be an array
 # (We can get the number of people from the length of p_rred_p)
 # if p_rred_p < r then rred_p = 1e-5, otherwise rred_p = 1
 # return rred_p
-def gen_rred_p(p_rred_p):
-    ...
+# The random numbers come from rng: by default the np.random module, or pass a np.random.Generator to seed or share one
+def gen_rred_p(p_rred_p, rng=np.random):
+    r = rng.uniform(size=len(p_rred_p))
+    return np.where(p_rred_p < r, 1e-5, 1)
 
 
 # Calculate the risk reduction
 # risk reduction is the product of newp_factor, rred_a, rred_initial, and rred_p
 # You can call your gen_rred_p function in the body of this function to get rred_p from p_rred_p
-def calc_risk_reduction(p_rred_p, newp_factor, rred_a, rred_initial):
-    ...
+def calc_risk_reduction(p_rred_p, newp_factor, rred_a, rred_initial, rng=np.random):
+    return newp_factor * rred_a * rred_initial * gen_rred_p(p_rred_p, rng)
 
 
 print(calc_risk_reduction(p_rred_p_array, newp_factor_array, rred_a_array, rred_initial))
+
+
+# calc_risk_reduction creates a new full-size array at every stage (the random numbers, rred_p, and each product), so
+# for a population of 50 million people it briefly needs several GB. The version below does the same calculation
+# without any full-size temporary arrays:
+# - the result is written into an array `out`, which the caller can allocate once and reuse at every time step
+# - the people are processed in chunks small enough to stay in the CPU cache, using work arrays from a ScratchArena
+#   which are also reused from one call to the next
+# - optionally, everything can be done in float32, which halves the memory needed
+# So the only full-size array it needs is `out` itself.
+# Filling a work array with random numbers needs a np.random.Generator (the np.random module can't do this), so rng
+# must be a Generator; by default a new, unseeded one is used.
+
+
+class ScratchArena:
+    """A store of work arrays which are reused between calls instead of being allocated every time."""
+
+    def __init__(self):
+        self.arrays = {}
+
+    def get(self, name, size, dtype):
+        """A work array of at least `size` elements, returned as a view of exactly `size` elements."""
+        array = self.arrays.get((name, np.dtype(dtype)))
+        if array is None or len(array) < size:
+            array = np.empty(size, dtype=dtype)
+            self.arrays[(name, np.dtype(dtype))] = array
+        return array[:size]
+
+
+def calc_risk_reduction_into(p_rred_p, newp_factor, rred_a, rred_initial, out=None, scratch=None, dtype=np.float64,
+                             chunk_size=16384, rng=None):
+    """Calculate the risk reduction like calc_risk_reduction, writing it into `out` a chunk at a time.
+
+    In float64, this gives exactly the same result as calc_risk_reduction given a Generator in the same state.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    size = len(p_rred_p)
+    if out is None:
+        out = np.empty(size, dtype=dtype)
+    if scratch is None:
+        scratch = ScratchArena()
+    dtype = out.dtype
+
+    for start in range(0, size, chunk_size):
+        stop = min(start + chunk_size, size)
+        chunk = out[start:stop]
+
+        # rred_p is 1e-5 where p_rred_p < r, otherwise 1
+        r = rng.random(out=scratch.get("r", stop - start, dtype), dtype=dtype)
+        below = np.less(p_rred_p[start:stop], r, out=scratch.get("below", stop - start, bool))
+        rred_p = scratch.get("rred_p", stop - start, dtype)
+        rred_p.fill(1)
+        np.copyto(rred_p, 1e-5, where=below)
+
+        # the product newp_factor * rred_a * rred_initial * rred_p, in the same order as calc_risk_reduction
+        np.multiply(newp_factor[start:stop], rred_a[start:stop], out=chunk)
+        np.multiply(chunk, rred_initial, out=chunk)
+        np.multiply(chunk, rred_p, out=chunk)
+    return out
+
+
+# For example, allocating the output and the work arrays once and reusing them at each time step
+risk_reduction = np.empty(pop_size, dtype=np.float32)
+scratch = ScratchArena()
+rng = np.random.default_rng()
+for time_step in range(3):
+    calc_risk_reduction_into(p_rred_p_array, newp_factor_array, rred_a_array, rred_initial,
+                             out=risk_reduction, scratch=scratch, rng=rng)
+print(risk_reduction)
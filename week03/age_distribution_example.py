@@ -1,6 +1,6 @@
+import functools
+
 import numpy as np
-from scipy.interpolate import interp1d
-import matplotlib.pyplot as plt
 
 
 # Classes provide an interface for use in other code. You don't need to know exactly how the class works as long as you
@@ -37,6 +37,31 @@ class ContinuousAgeDistribution:
 
     n_inversion_points = 11
 
+    # Ages are generated by feeding uniform random numbers into the inverse of the cumulative distribution. There are
+    # several ways ("engines") of working out that inverse, which trade accuracy against speed:
+    # - "cubic": a cubic spline through n_inversion_points points of the CDF (scipy's interp1d); the original method
+    # - "table": straight lines between table_points points of the CDF, using np.interp
+    # - "newton": Newton's method on the exact CDF, starting from a small table; accurate to newton_tolerance
+    # - "guide": the same straight lines as "table" over guide_bins equal age bins, but finding the bin with a
+    #   "guide table" (which bin each 1/guide_bins of probability starts in) rather than a binary search
+    # cdf_error() measures how far each one is from the exact distribution, and choose_engine() names the fastest
+    # engine which is accurate enough, which can then be passed to gen_ages.
+    engines = ("guide", "cubic", "table", "newton")  # fastest first
+    engine = "cubic"
+    table_points = 4097
+    guide_bins = 4096
+    newton_start_points = 65
+    newton_tolerance = 1e-12
+
+    # Samplers (functions from uniform random numbers to ages) and their errors which have already been worked out,
+    # shared by every instance in this process and keyed by the engine, its settings, the model parameters and the
+    # age range
+    _sampler_cache = {}
+    _cdf_error_cache = {}
+
+    # Default number of ages generated at a time when filling a large output array
+    default_chunk_size = 1_000_000
+
     # Example parameters
     modelParams1 = [-7.19e-4, 5.39e-2, -8.10e-3, 2.12e1]
     modelParams2 = [-1.03e-3, 7.45e-2, -1.12e-3, 8.47]
@@ -44,6 +69,7 @@ class ContinuousAgeDistribution:
 
     def __init__(self, min_age, max_age, model_params):
         self.min_age = min_age
+        self.model_params = tuple(model_params)
         model_age_limit = -model_params[1]/model_params[0]
         if(max_age > model_age_limit):
             print(f"Max age exceeds the maximum age limit for "
@@ -54,7 +80,9 @@ class ContinuousAgeDistribution:
             self.max_age = max_age
         self.cpd = lambda x: self._integrated_linexp(x, *model_params)
 
+    # The selected distributions are cached, so calling select_model repeatedly gives back the same object
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def select_model(cls, inc_cat):
         if(inc_cat == 1):
             return cls(-68, 65, cls.modelParams1)
@@ -63,50 +91,190 @@ class ContinuousAgeDistribution:
         else:
             return cls(-68, 65, cls.modelParams3)
 
-    def gen_ages(self, N):
-        """Generate ages using a (non-normalised) continuous cumulative probability distribution
+    def normalised_cdf(self, x):
+        """The cumulative probability distribution, normalised over the age range"""
+        C = self.cpd(self.min_age)
+        M = 1/(self.cpd(self.max_age)-self.cpd(self.min_age))
+        return M*(self.cpd(x) - C)
+
+    def normalised_pdf(self, x):
+        """The probability density, normalised over the age range (the derivative of normalised_cdf)"""
+        m, c, A, B = self.model_params
+        M = 1/(self.cpd(self.max_age)-self.cpd(self.min_age))
+        return M*(m*x + c)*np.exp(A*(x-B))
+
+    def _cdf_table(self, n_points):
+        """n_points equally spaced ages and the normalised CDF at each of them"""
+        NormX = np.linspace(self.min_age, self.max_age, n_points)
+        NormY = self.normalised_cdf(NormX)
+
+        # fix the start and end values in case of numerical errors
+        NormY[0] = 0.0
+        NormY[-1] = 1.0
+        return NormX, NormY
+
+    def inverse_cdf(self):
+        """Get the inverse of the normalised cumulative probability distribution, building it on first use.
 
         Given an analytic PD, this should also be analytically defined
         Cumulative probability distribution is defined in _integratedLinexp
         """
-        # Normalise distribution over given range
-        C = self.cpd(self.min_age)
-        M = 1/(self.cpd(self.max_age)-self.cpd(self.min_age))
+        return self.sampler("cubic")
+
+    def sampler(self, engine=None):
+        """Get the function converting uniform random numbers to ages for an engine (by default self.engine)"""
+        engine = engine or self.engine
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine {engine!r}; choose from {', '.join(self.engines)}")
+        key = self._engine_key(engine)
+        if key not in self._sampler_cache:
+            self._sampler_cache[key] = getattr(self, "_build_" + engine)()
+        return self._sampler_cache[key]
+
+    def _engine_key(self, engine):
+        """Everything which decides what an engine's sampler does: its settings, the model and the age range"""
+        settings = {
+            "cubic": (self.n_inversion_points,),
+            "table": (self.table_points,),
+            "newton": (self.newton_start_points, self.newton_tolerance),
+            "guide": (self.guide_bins,),
+        }[engine]
+        return (engine, settings, self.model_params, self.min_age, self.max_age)
 
-        def norm_dist(x):
-            return M*(self.cpd(x) - C)
+    def _build_cubic(self):
+        # scipy is only imported the first time an inverse is built, so just importing this file stays quick
+        from scipy.interpolate import interp1d
 
         # sample and invert the normalised distribution (in case analytic inverse in impractical)
-        NormX = np.linspace(self.min_age, self.max_age, self.n_inversion_points)
-        NormY = norm_dist(NormX)
+        NormX, NormY = self._cdf_table(self.n_inversion_points)
+        return interp1d(NormY, NormX, kind='cubic')
 
-        # fix the start and end values in case of numerical errors
-        NormY[0] = 0.0
-        NormY[self.n_inversion_points-1] = 1.0
-        NormInv = interp1d(NormY, NormX, kind='cubic')
+    def _build_table(self):
+        NormX, NormY = self._cdf_table(self.table_points)
+        return lambda R: np.interp(R, NormY, NormX)
+
+    def _build_newton(self):
+        NormX, NormY = self._cdf_table(self.newton_start_points)
+
+        def newton(R):
+            # Start from a straight-line guess, then repeatedly move x by (F(x) - R) / F'(x), keeping it in range
+            x = np.interp(R, NormY, NormX)
+            for _ in range(50):
+                error = self.normalised_cdf(x) - R
+                if np.max(np.abs(error), initial=0) < self.newton_tolerance:
+                    break
+                x = np.clip(x - error/self.normalised_pdf(x), self.min_age, self.max_age)
+            return x
+        return newton
+
+    def _build_guide(self):
+        NormX, NormY = self._cdf_table(self.guide_bins + 1)
+        width = NormX[1] - NormX[0]
+        # guide[j] is the bin containing probability j/guide_bins, so the bin for R is at or just after
+        # guide[floor(R*guide_bins)]
+        guide = np.searchsorted(NormY[1:], np.arange(self.guide_bins)/self.guide_bins, side="right")
+
+        def guided(R):
+            R = np.asarray(R)
+            i = guide[np.minimum((R*self.guide_bins).astype(np.int64), self.guide_bins - 1)]
+            behind = np.flatnonzero((NormY[i + 1] <= R) & (i < self.guide_bins - 1))
+            while len(behind):
+                i[behind] += 1
+                behind = behind[(NormY[i[behind] + 1] <= R[behind]) & (i[behind] < self.guide_bins - 1)]
+            return NormX[i] + (R - NormY[i])/(NormY[i + 1] - NormY[i])*width
+        return guided
+
+    def cdf_error(self, engine=None, n_points=100001):
+        """The largest difference between R and the exact CDF at the age an engine gives for R, over n_points
+        equally spaced values of R between 0 and 1"""
+        engine = engine or self.engine
+        key = (self._engine_key(engine), n_points)
+        if key not in self._cdf_error_cache:
+            R = np.linspace(0, 1, n_points)
+            self._cdf_error_cache[key] = float(np.max(np.abs(self.normalised_cdf(self.sampler(engine)(R)) - R)))
+        return self._cdf_error_cache[key]
+
+    def engine_report(self):
+        """The CDF error of every engine"""
+        return {engine: self.cdf_error(engine) for engine in self.engines}
+
+    def choose_engine(self, tolerance):
+        """The name of the fastest engine whose CDF error is within `tolerance`
+
+        This does not change self.engine (select_model gives every caller the same object), so pass the name on,
+        e.g. gen_ages(N, engine=age_dist.choose_engine(1e-6)).
+        """
+        for engine in self.engines:
+            if self.cdf_error(engine) <= tolerance:
+                return engine
+        raise ValueError(f"No engine has a CDF error within {tolerance} (best: {min(self.engine_report().values())})")
+
+    def gen_ages(self, N, out=None, chunk_size=None, engine=None):
+        """Generate N ages using the (cached) inverse cumulative probability distribution
+
+        If an array `out` is given the ages are written into it, chunk_size at a time, so that even very large
+        arrays can be filled using a small, fixed amount of extra memory. engine defaults to self.engine.
+        """
+        if out is None:
+            if chunk_size is None:
+                # generate N random numbers in (0,1) and convert to ages
+                R = np.random.uniform(0, 1, N)
+                return self.sampler(engine)(R)
+            out = np.empty(N)
+        start = 0
+        for ages in self.iter_ages(N, chunk_size, engine):
+            out[start:start+len(ages)] = ages
+            start += len(ages)
+        return out
+
+    def iter_ages(self, N, chunk_size=None, engine=None):
+        """Generate N ages as a sequence of arrays of at most chunk_size ages each"""
+        chunk_size = chunk_size or self.default_chunk_size
+        NormInv = self.sampler(engine)
+        for start in range(0, N, chunk_size):
+            R = np.random.uniform(0, 1, min(chunk_size, N - start))
+            yield NormInv(R)
+
+
+# The examples below only run when this file is run as a script, so that other code can import the class without
+# generating and plotting ages.
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
 
-        # generate N random numbers in (0,1) and convert to ages
-        R = np.random.uniform(0, 1, N)
-        Ages = NormInv(R)
-        return Ages
+    # But all you need to do to generate an age sample is this line!
+    ages = ContinuousAgeDistribution.select_model(1).gen_ages(10000)
 
+    # We can see how accurate each of the ways of generating ages is, and choose the fastest one which is accurate
+    # enough for what we need
+    print("Largest CDF error of each engine:", ContinuousAgeDistribution.select_model(1).engine_report())
+    engine = ContinuousAgeDistribution.select_model(1).choose_engine(1e-6)
+    print("Engine for a tolerance of 1e-6:", engine)
+    ages = ContinuousAgeDistribution.select_model(1).gen_ages(10000, engine=engine)
 
-# But all you need to do to generate an age sample is this line!
-ages = ContinuousAgeDistribution.select_model(1).gen_ages(10000)
+    # We can then plot to see if it looks like we expect
+    plt.hist(ages)
+    plt.show()
 
-# We can then plot to see if it looks like we expect
-plt.hist(ages)
-plt.show()
+    # Or we can create the distribution and generate multiple population ages
+    age_dist = ContinuousAgeDistribution.select_model(1)
+    population_ages = [age_dist.gen_ages(1000) for i in range(10)]  # generate 10 random population-wide age samples
 
-# Or we can create the distribution and generate multiple population ages
-age_dist = ContinuousAgeDistribution.select_model(1)
-population_ages = [age_dist.gen_ages(1000) for i in range(10)]  # generate 10 random population-wide age samples
+    # And plot them
+    for i in range(10):
+        ys, bins = np.histogram(population_ages[i])
+        xs = (bins[1:] + bins[:-1])/2
+        plt.plot(xs, ys, label=f"population {i}")
+    plt.legend()
+    plt.show()
 
-# And plot them
-for i in range(10):
-    ys, bins = np.histogram(population_ages[i])
-    xs = (bins[1:] + bins[:-1])/2
-    plt.plot(xs, ys, label=f"population {i}")
-plt.legend()
-plt.show()
+    # With many populations a line for each one is unreadable (and they would all have to be kept in memory), so
+    # instead we can histogram each population as it is generated, with the same bins for all of them, and keep only
+    # a summary of the histograms (see ensemble_summary.py): the median and quantiles of the count in each bin.
+    from ensemble_summary import EnsembleSummary
 
+    bins = np.linspace(age_dist.min_age, age_dist.max_age, 21)
+    summary = EnsembleSummary()
+    for i in range(10000):
+        ys, _ = np.histogram(age_dist.gen_ages(1000), bins)
+        summary.add({"people": ys})
+    summary.plot("people", x=(bins[1:] + bins[:-1])/2, label="Age")
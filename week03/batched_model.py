@@ -0,0 +1,177 @@
+# Running many replicates of the toy model at once.
+# A parameter point usually needs hundreds of stochastic replicates of a small population (e.g. 1000 people). Running
+# them one after another spends most of the time in the Python interpreter rather than in NumPy, because each array
+# operation only covers 1000 people. Here the replicates are stacked into 2D arrays with one row per replicate and
+# one column per person, so that a single NumPy operation advances every replicate at once.
+#
+# The steps are the same as initialise_population, update and summarise in infection_toy_model.py (using the
+# closed-form "binomial" sampling), applied to each row separately: in particular each replicate has its own
+# prevalence_in_contacts. (Unlike update(), recoveries are not re-checked against time_of_infection, since a batch has
+# no Person API through which an infection could be changed by hand.)
+
+import numpy as np
+
+from infection_toy_model import NO_COUNT, NO_TIME, Parameters, samplers
+
+
+# As in Population, the batch keeps some bookkeeping so that each step only looks at the people who can change: the
+# running totals for each replicate, an index of people who may still be susceptible, and a recovery calendar. People
+# are referred to by their position in the flattened arrays, so person i of replicate r is number r*size + i.
+class BatchedPopulation:
+    def __init__(self, replicates, size, params=None, rng=None):
+        """Create `replicates` independent populations of `size` people, none of them infected.
+
+        As with Population, params is a Parameters object and rng defaults to the np.random module.
+        """
+        self.replicates = replicates
+        self.size = size
+        self.params = params if params is not None else Parameters()
+        self.rng = rng if rng is not None else np.random
+        shape = (replicates, size)
+        self.infected = np.zeros(shape, dtype=bool)
+        self.time_of_infection = np.full(shape, NO_TIME, dtype=np.int64)
+        self.ever_infected = np.zeros(shape, dtype=bool)
+        self.new_infection = np.zeros(shape, dtype=bool)
+
+        self.contacts = self.rng.poisson(self.params.contact_number_parameter, shape)
+        self.infected_contacts = np.zeros(shape, dtype=np.int64)
+
+        # Totals for each replicate
+        self.total_contacts = self.contacts.sum(axis=1)
+        self.contacts_if_infected = np.zeros(replicates, dtype=np.int64)
+        self.total_infected = np.zeros(replicates, dtype=np.int64)
+        self.new_infections = np.zeros(replicates, dtype=np.int64)
+
+        self._new_infection_people = np.array([], dtype=np.int64)
+        self._susceptible = np.arange(replicates * size)
+        self._recovery_calendar = {}
+
+    def flat(self, name):
+        """A column as a 1D view, indexed by r*size + i."""
+        return getattr(self, name).reshape(-1)
+
+    def infect(self, people, time):
+        """Infect the people at the given flat positions (who must not already be infected)."""
+        replicate = people // self.size
+        self.total_infected += np.bincount(replicate, minlength=self.replicates)
+        self.contacts_if_infected += np.bincount(
+            replicate, weights=self.flat("contacts")[people], minlength=self.replicates
+        ).astype(np.int64)
+        self.new_infections += np.bincount(replicate, minlength=self.replicates)
+        self._new_infection_people = np.concatenate([self._new_infection_people, people])
+
+        self.flat("infected")[people] = True
+        self.flat("time_of_infection")[people] = time
+        self.flat("ever_infected")[people] = True
+        self.flat("new_infection")[people] = True
+        self._recovery_calendar.setdefault(time + self.params.duration_of_infectivity, []).append(people)
+
+    def recover(self, people):
+        replicate = people // self.size
+        self.total_infected -= np.bincount(replicate, minlength=self.replicates)
+        self.contacts_if_infected -= np.bincount(
+            replicate, weights=self.flat("contacts")[people], minlength=self.replicates
+        ).astype(np.int64)
+        self.flat("infected")[people] = False
+        self.flat("time_of_infection")[people] = NO_TIME
+
+
+def initialise_batch(replicates, population_size, params=None, rng=None):
+    """Create the replicate populations, with only the first person in each one infected."""
+    batch = BatchedPopulation(replicates, population_size, params, rng)
+    batch.infect(np.arange(replicates) * population_size, 0)  # infect the first person of each replicate
+    return batch
+
+
+def summarise_batch(batch):
+    """The statistics from summarise(), as arrays with one value per replicate."""
+    stats = {
+        "contacts": batch.total_contacts.copy(),
+        "contacts_if_infected": batch.contacts_if_infected.copy(),
+        "infected": batch.total_infected.copy(),
+        "new_infections": batch.new_infections.copy(),
+    }
+    stats["prevalence_in_contacts"] = stats["contacts_if_infected"] / stats["contacts"]
+    stats["overall prevalence"] = stats["infected"] / batch.size
+    return stats
+
+
+def update_batch(batch, time):
+    """Advance every replicate by one time step."""
+    params = batch.params
+
+    if time == 0:
+        # At the start of the simulation, use a predefined value as we have no data
+        prevalence_in_contacts = np.full(batch.replicates, params.initial_prevalence_in_contacts)
+    else:
+        prevalence_in_contacts = batch.contacts_if_infected / batch.total_contacts
+
+    # People infected at the last step are no longer new, and have no infected contacts counted
+    previous_infections = batch._new_infection_people
+    batch.flat("new_infection")[previous_infections] = False
+    batch.flat("infected_contacts")[previous_infections] = NO_COUNT
+    batch._new_infection_people = np.array([], dtype=np.int64)
+    batch.new_infections[:] = 0
+
+    # People recover after duration_of_infectivity
+    due = batch._recovery_calendar.pop(time, [])
+    if due:
+        batch.recover(np.concatenate(due))
+
+    # Only people who have never been infected can be infected. Each person is given the prevalence in contacts of
+    # their own replicate, and then the draws are the same as for a single population. In replicates where nobody
+    # is infected any more there is nothing to draw: everyone there has no infected contacts.
+    batch._susceptible = batch._susceptible[~batch.flat("ever_infected")[batch._susceptible]]
+    prevalence_per_person = prevalence_in_contacts[batch._susceptible // batch.size]
+    can_be_infected = prevalence_per_person > 0
+    susceptible = batch._susceptible[can_be_infected]
+    batch.flat("infected_contacts")[batch._susceptible[~can_be_infected]] = 0
+
+    infected_contacts, newly_infected = samplers["binomial"](
+        batch.flat("contacts")[susceptible], prevalence_per_person[can_be_infected],
+        params.rate_per_infected_contact, batch.rng
+    )
+    batch.flat("infected_contacts")[susceptible] = infected_contacts
+    batch.infect(susceptible[newly_infected], time)
+
+
+def simulate_batch(replicates, population_size, params=None, rng=None):
+    """Run `replicates` independent simulations of the toy model together.
+
+    Returns a dictionary mapping each summary statistic to an array of shape (replicates, simulation_time): row r is
+    the time series for replicate r.
+    """
+    batch = initialise_batch(replicates, population_size, params, rng)
+    simulation_time = batch.params.simulation_time
+    stats = summarise_batch(batch)
+    results = {key: np.empty((replicates, simulation_time), dtype=values.dtype) for key, values in stats.items()}
+    for key, values in stats.items():
+        results[key][:, 0] = values
+    for t in range(1, simulation_time):
+        update_batch(batch, t)
+        for key, values in summarise_batch(batch).items():
+            results[key][:, t] = values
+    return results
+
+
+if __name__ == "__main__":
+    import time as clock
+
+    from config_class_example import Config
+    from infection_toy_model import simulate
+
+    cfg = Config(num_people=1000, infectious_period=2, sim_time=20)
+    params = Parameters.from_config(cfg)
+
+    start = clock.perf_counter()
+    results = simulate_batch(1000, cfg.population_size, params, np.random.default_rng(1))
+    print(f"1000 replicates together: {clock.perf_counter() - start:.2f} s")
+
+    start = clock.perf_counter()
+    one_at_a_time = [simulate(cfg.population_size, params, np.random.default_rng(seed), verbose=False)
+                     for seed in range(100)]
+    print(f"100 replicates one at a time: {clock.perf_counter() - start:.2f} s")
+
+    print("Mean infected over time (batched):", results["infected"].mean(axis=0).round(1))
+    print("Mean infected over time (one at a time):",
+          np.mean([[stats["infected"] for stats in run] for run in one_at_a_time], axis=0).round(1))
@@ -11,24 +11,92 @@ from infection_toy_model import Person
 from infection_toy_model import initialise_population
 
 # Or you may wish to copy it across so that you can modify it or place it inside a class.
+from infection_toy_model import Parameters, Population, summarise, update
+from output_class_example import Output
 
 # And these are just standard useful imports
+import json
+import os
+
 import numpy as np
-import matplotlib.pyplot as plt
+
+
+# The statistics recorded by a Simulation: everything calculated by summarise() in the toy model. summarise() works
+# them all out in one go, so rather than giving the Output a function for each one (which would call summarise() once
+# per statistic), the Simulation calls it once per step and records the results (see Output.record).
+summary_keys = ("contacts", "contacts_if_infected", "infected", "new_infections", "prevalence_in_contacts",
+                "overall prevalence")
 
 
 # Simulation class
+# One possible answer to the exercise. A Simulation holds everything about one run: its parameters, its random number
+# generator, its population, the current time, and an Output with the results so far.
+# Because all of this lives in one object, it can also be saved to a checkpoint file every so often and picked up
+# again from that file if the run is interrupted, without having to start again from the beginning.
 class Simulation:
-    # What properties does the simulation need to have?
+    # The simulation is created from the population size and a Parameters object (see infection_toy_model.py), and
+    # a seed for its random number generator. If checkpoint_file and checkpoint_every are given, run() saves a
+    # checkpoint to that file every checkpoint_every steps.
+    def __init__(self, population_size, params=None, seed=None, checkpoint_file=None, checkpoint_every=None):
+        self.params = params if params is not None else Parameters()
+        self.rng = np.random.default_rng(seed)
+        self.population = initialise_population(population_size, self.params, self.rng)
+        self.output = Output(self.population, self.params.simulation_time, dict.fromkeys(summary_keys))
+        self.output.record(0, summarise(self.population))
+        self.time = 0
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = checkpoint_every
 
-    # How should the simulation be initialised? What information need to be passed in
-    # to create the object, and how should things be set? Should anything be checked?
-    def __init__(self):
-
-    # Should this method take any additional arguments, or should everything be member variables of the
-    # simulation itself?
-    # How do you want to handle the results?
+    # Run the rest of the simulation (from the current time, so this also carries on a resumed simulation)
+    # and return the Output.
     def run(self):
+        while self.time < self.params.simulation_time - 1:
+            self.time += 1
+            update(self.population, self.time)
+            self.output.record(self.time, summarise(self.population))
+            if self.checkpoint_every and self.time % self.checkpoint_every == 0:
+                self.save_checkpoint(self.checkpoint_file)
+        return self.output
 
-    # You can add more methods as you see fit!
+    # A checkpoint is a NumPy .npz file holding the population columns, the output table, the current time, the
+    # parameters and the state of the random number generator (written out as JSON text). Everything is stored as
+    # plain arrays, so saving and loading is quick even for very large populations, and nothing is pickled.
+    # The file is written under a temporary name first, so a crash while saving leaves the previous checkpoint intact.
+    def save_checkpoint(self, filename):
+        """Save the current state of the simulation to `filename`."""
+        temporary_filename = filename + ".tmp"
+        with open(temporary_filename, "wb") as checkpoint:
+            np.savez(
+                checkpoint,
+                time=self.time,
+                rng_state=json.dumps(self.rng.bit_generator.state),
+                statistics=list(self.output.statistics),
+                results=self.output.results,
+                **{"param_" + name: getattr(self.params, name) for name in Parameters.names},
+                **self.population.columns(),
+            )
+        os.replace(temporary_filename, filename)
 
+    @classmethod
+    def resume(cls, filename, checkpoint_every=None):
+        """Load a simulation from a checkpoint file; calling run() then carries on exactly where it stopped."""
+        with np.load(filename, allow_pickle=False) as checkpoint:
+            params = Parameters(**{name: checkpoint["param_" + name].item() for name in Parameters.names})
+
+            rng_state = json.loads(str(checkpoint["rng_state"]))
+            bit_generator = getattr(np.random, rng_state["bit_generator"])()
+            bit_generator.state = rng_state
+
+            simulation = cls.__new__(cls)
+            simulation.params = params
+            simulation.rng = np.random.Generator(bit_generator)
+            simulation.population = Population.from_columns(checkpoint, params, simulation.rng)
+            statistics = dict.fromkeys(checkpoint["statistics"].tolist())
+            simulation.output = Output(simulation.population, params.simulation_time, statistics)
+            simulation.output.results[...] = checkpoint["results"]
+            simulation.time = int(checkpoint["time"])
+        simulation.checkpoint_file = filename
+        simulation.checkpoint_every = checkpoint_every
+        return simulation
+
+    # You can add more methods as you see fit!
@@ -1,8 +1,16 @@
 # Python classes can be used to organise and encapsulate data which is relevant to a particular part of the code
 # For example configurations
 
+import hashlib
+import json
+
 import numpy as np
 
+# The values the randomised parameters are sampled from
+rate_per_infected_contact_choices = [0.1, 0.2, 0.3]
+contact_number_parameter_choices = range(5, 10)
+initial_prevalence_in_contacts_choices = [0.001, 0.01, 0.1]
+
 
 # Running multiple simulations with different configurations can easily get messy
 # Let's take as an example the parameters from our epidemiology toy model
@@ -20,47 +28,194 @@ class Config:
     # number of these config objects.
     def __init__(self, num_people, infectious_period, sim_time):
         self.population_size = num_people
-        self.rate_per_infected_contact = np.random.choice([0.1, 0.2, 0.3])
+        self.rate_per_infected_contact = np.random.choice(rate_per_infected_contact_choices)
         self.infectious_period = infectious_period
-        self.contact_number_parameter = np.random.choice(range(5, 10))
-        self.initial_prevalence_in_contacts = np.random.choice([0.001, 0.01, 0.1])
+        self.contact_number_parameter = np.random.choice(contact_number_parameter_choices)
+        self.initial_prevalence_in_contacts = np.random.choice(initial_prevalence_in_contacts_choices)
         self.simulation_time = sim_time
         assert self.validate_config()
 
     # Object creation is a good opportunity to check the validity of parameters; if this happens whenever an object is
     # created then we don't have to keep track of all the points in our code where this might need to happen, it will
     # happen automatically. Here we check that probabilities are between 0 and 1, and other parameters are greater than
-    # 0 in order for the configuration parameters to be acceptable.
+    # 0 in order for the configuration parameters to be acceptable (the checks themselves are in validity_checks
+    # below, so that a ConfigTable can make exactly the same checks).
     def validate_config(self):
         print("Validating configuration")
-        config_valid = True
-        config_valid &= (0 <= self.initial_prevalence_in_contacts <= 1)
-        config_valid &= self.simulation_time > 0
-        config_valid &= self.population_size > 0
-        config_valid &= self.infectious_period > 0
-        config_valid &= (0 <= self.rate_per_infected_contact <= 1)
-        config_valid &= self.contact_number_parameter > 0
+        config_valid = all(validity_checks(self).values())
         print("Config okay?", config_valid)
         return config_valid
 
     # Other methods could be useful, for example saving the config to a file so
     # that randomly generated configs can be retained for future reference.
+    # To do this we write the config in a "canonical" form: the same parameter values always give exactly the same
+    # text, whatever order they were set in and whether they are NumPy or plain Python numbers. A hash of that text
+    # then identifies the configuration, which lets us recognise configurations that have been run before (see
+    # result_cache.py).
+    names = ("population_size", "rate_per_infected_contact", "infectious_period", "contact_number_parameter",
+             "initial_prevalence_in_contacts", "simulation_time")
+
+    def to_dict(self):
+        values = {}
+        for name in self.names:
+            value = getattr(self, name)
+            # NumPy numbers (which np.random.choice returns) are turned into plain Python numbers
+            values[name] = value.item() if isinstance(value, np.generic) else value
+        return values
+
+    @classmethod
+    def from_dict(cls, values, validate=True):
+        """Create a Config with the given parameter values, rather than sampling them."""
+        config = Config.__new__(Config)
+        for name in Config.names:
+            setattr(config, name, values[name])
+        if validate:
+            assert config.validate_config()
+        return config
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+
+    def config_hash(self):
+        """A hash of the canonical form; two configs have the same hash if and only if all their values are equal."""
+        return hashlib.sha256(self.to_json().encode()).hexdigest()
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            f.write(self.to_json())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls.from_dict(json.load(f))
+
+
+def validity_checks(config):
+    """The checks made by validate_config, as a dictionary of check name -> whether it passed.
+
+    Only operators which also work on whole NumPy arrays are used, so `config` can also be a ConfigTable, in which
+    case each result is an array of booleans with one entry per row.
+    """
+    return {
+        "initial_prevalence_in_contacts": ((0 <= config.initial_prevalence_in_contacts)
+                                           & (config.initial_prevalence_in_contacts <= 1)),
+        "simulation_time": config.simulation_time > 0,
+        "population_size": config.population_size > 0,
+        "infectious_period": config.infectious_period > 0,
+        "rate_per_infected_contact": (0 <= config.rate_per_infected_contact) & (config.rate_per_infected_contact <= 1),
+        "contact_number_parameter": config.contact_number_parameter > 0,
+    }
+
+
+# Creating a very large ensemble one Config at a time is slow (each one makes its own random choices and prints its
+# validation), so a ConfigTable holds a whole ensemble "column by column" instead, like the Population class in
+# infection_toy_model.py: one array for each parameter, with one entry per configuration. Every randomised parameter
+# is sampled for all the configurations in one call, and the validation checks run on whole columns at once.
+# table[i] is a ConfigRow, a view of row i which can be used anywhere a Config can (e.g. in run_ensemble).
+class ConfigTable:
+    def __init__(self, columns):
+        """Create a table from a dictionary mapping each name in Config.names to an array."""
+        for name in Config.names:
+            setattr(self, name, np.asarray(columns[name]))
+        self.size = len(self.population_size)
+
+    @classmethod
+    def sample(cls, n, num_people, infectious_period, sim_time, rng=np.random):
+        """Create n configurations, sampling the randomised parameters in the same way as Config."""
+        return cls({
+            "population_size": np.full(n, num_people),
+            "rate_per_infected_contact": rng.choice(rate_per_infected_contact_choices, size=n),
+            "infectious_period": np.full(n, infectious_period),
+            "contact_number_parameter": rng.choice(contact_number_parameter_choices, size=n),
+            "initial_prevalence_in_contacts": rng.choice(initial_prevalence_in_contacts_choices, size=n),
+            "simulation_time": np.full(n, sim_time),
+        })
+
+    @classmethod
+    def from_configs(cls, configs):
+        return cls({name: [getattr(config, name) for config in configs] for name in Config.names})
+
+    def columns(self):
+        return {name: getattr(self, name) for name in Config.names}
+
+    def valid(self):
+        """An array which is True for each row that passes every check."""
+        valid = np.ones(self.size, dtype=bool)
+        for passed in validity_checks(self).values():
+            valid &= passed
+        return valid
+
+    def invalid_rows(self):
+        """For each check which some rows fail, the indices of those rows."""
+        failures = {}
+        for check, passed in validity_checks(self).items():
+            failed = np.flatnonzero(~passed)
+            if len(failed):
+                failures[check] = failed
+        return failures
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not -self.size <= index < self.size:
+            raise IndexError(f"ConfigTable index {index} out of range")
+        return ConfigRow(self, index % self.size)
+
+    def __iter__(self):
+        return (ConfigRow(self, i) for i in range(self.size))
+
+
+def _field(name):
+    """Property reading one parameter of a ConfigRow from its table."""
+    return property(lambda row: getattr(row._table, name)[row._index].item())
+
+
+class ConfigRow(Config):
+    """A view of one row of a ConfigTable, which behaves like a (read-only) Config."""
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    population_size = _field("population_size")
+    rate_per_infected_contact = _field("rate_per_infected_contact")
+    infectious_period = _field("infectious_period")
+    contact_number_parameter = _field("contact_number_parameter")
+    initial_prevalence_in_contacts = _field("initial_prevalence_in_contacts")
+    simulation_time = _field("simulation_time")
+
+    def __reduce__(self):
+        # When a row is sent to a worker process, send a plain Config with its values rather than the whole table
+        return Config.from_dict, (self.to_dict(), False)
+
 
+# The example below only runs when this file is run as a script, so that other code (like ensemble_runner.py, and
+# the worker processes it starts) can import the Config class without creating and printing an ensemble.
+if __name__ == "__main__":
+    # Let's create an ensemble of configurations, and the population size and the initial prevalence
+    cfg_list = [Config(num_people=1000, infectious_period=3, sim_time=100) for i in range(5)]
+    for cfg in cfg_list:
+        print(f"Population = {cfg.population_size}, Initial Prevalence = {cfg.initial_prevalence_in_contacts}")
 
-# Let's create an ensemble of configurations, and the population size and the initial prevalence
-cfg_list = [Config(num_people=1000, infectious_period=3, sim_time=100) for i in range(5)]
-for cfg in cfg_list:
-    print(f"Population = {cfg.population_size}, Initial Prevalence = {cfg.initial_prevalence_in_contacts}")
+    # We can see from the print-out that:
+    # 1. Validation is run on all the configurations automatically as part of the init
+    # 2. Each config has the same population size (because we passed it as input)
+    # 3. The configs vary in initial prevalence because it is independently sampled as part of the init of each config
 
-# We can see from the print-out that:
-# 1. Validation is run on all the configurations automatically as part of the init
-# 2. Each config has the same population size (because we passed it as input)
-# 3. The configs vary in initial prevalence because it is independently sampled as part of the init of each config
+    # Configurations can be created very concisely, and  configurations can now easily be run in separate simulations,
+    # either sequentially by iterating over the list or in parallel!
+    # (This is particularly useful for parallel code because all of the config parameters are generated
+    # early on and kept separate and can be passed around as a complete unit.)
+    # e.g.
+    # for cfg in cfg_list:
+    #    run_simulation(cfg)
+    # or, to run them in parallel on a pool of worker processes (see ensemble_runner.py):
+    # run_ensemble(cfg_list, workers=4)
 
-# Configurations can be created very concisely, and  configurations can now easily be run in separate simulations,
-# either sequentially by iterating over the list or in parallel!
-# (This is particularly useful for parallel code because all of the config parameters are generated
-# early on and kept separate and can be passed around as a complete unit.)
-# e.g.
-# for cfg in cfg_list:
-#    run_simulation(cfg)
+    # For large ensembles, a ConfigTable creates all the configurations at once and validates them without printing
+    # anything for each one; any rows which fail a check are reported by invalid_rows()
+    table = ConfigTable.sample(100_000, num_people=1000, infectious_period=3, sim_time=100)
+    print(f"{len(table)} configurations, failed checks: {table.invalid_rows() or 'none'}")
+    print(f"Row 0: Population = {table[0].population_size}, "
+          f"Initial Prevalence = {table[0].initial_prevalence_in_contacts}")
@@ -0,0 +1,80 @@
+# An explicit network of partnerships for the toy model.
+# In infection_toy_model.py each person only has a number of contacts, and the chance that a contact is infected is
+# the same for everyone (prevalence_in_contacts). Here we instead decide who each person's contacts actually are, so
+# that infection can only travel along real partnerships.
+#
+# The network is built "configuration model" style: each person gets one "stub" per contact, and the stubs are paired
+# up at random to make partnerships. It is stored in compressed sparse row (CSR) form, which is compact enough for
+# tens of millions of people: the partners of person i are indices[indptr[i]:indptr[i+1]]. Each partnership appears
+# twice, once in each partner's row. With 32-bit indices this takes 4 bytes per partner entry plus 8 bytes per person,
+# so 10 million people with 100 million partner entries need a little under 500MB.
+
+import numpy as np
+
+
+class ContactNetwork:
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+        self.size = len(indptr) - 1
+
+    @classmethod
+    def from_contacts(cls, contacts, rng=np.random):
+        """Build a random network in which person i has (about) contacts[i] partners.
+
+        Stubs which get paired with another stub of the same person are dropped rather than making a partnership
+        with themselves, as is one stub if the total is odd, so a few people end up with fewer partners than
+        contacts. Two people can occasionally be paired more than once.
+        """
+        contacts = np.asarray(contacts)
+        size = len(contacts)
+        n_stubs = int(contacts.sum())
+        index_type = np.int32 if max(size, n_stubs) < 2**31 else np.int64
+
+        # The stubs are listed person by person, so stub s belongs to owner[s] and the list is already in CSR order
+        owner = np.repeat(np.arange(size, dtype=index_type), contacts)
+
+        # Shuffle the stubs and pair them up two by two: partner[s] is the stub that stub s is paired with
+        order = rng.permutation(np.arange(n_stubs, dtype=index_type))
+        partner = np.empty(n_stubs, dtype=index_type)
+        n_pairs = n_stubs // 2
+        partner[order[0:2*n_pairs:2]] = order[1:2*n_pairs:2]
+        partner[order[1:2*n_pairs:2]] = order[0:2*n_pairs:2]
+        if n_stubs % 2:
+            partner[order[-1]] = order[-1]  # the odd stub out is paired with itself, so it is dropped below
+        del order
+
+        indices = owner[partner]
+        del partner
+
+        # Drop self-partnerships and rebuild the row pointers from the partners each person has left
+        keep = indices != owner
+        indices = indices[keep]
+        degree = contacts - np.bincount(owner[~keep], minlength=size)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+        return cls(indptr, indices)
+
+    def degree(self):
+        """The number of partners of each person."""
+        return np.diff(self.indptr)
+
+    def count_infected_partners(self, infected, chunk_size=2**20):
+        """Count how many partners of each person are infected.
+
+        The partner entries are processed chunk_size people at a time, so the temporary arrays stay small however
+        large the network is.
+        """
+        counts = np.zeros(self.size, dtype=np.int64)
+        for start in range(0, self.size, chunk_size):
+            stop = min(start + chunk_size, self.size)
+            first, last = self.indptr[start], self.indptr[stop]
+            if first == last:
+                continue
+            # Look up whether each partner is infected, then add these up person by person with np.add.reduceat.
+            # reduceat does not handle rows with no partners, so only people with partners are included.
+            infected_partner = infected[self.indices[first:last]].astype(np.int32)
+            row_starts = self.indptr[start:stop] - first
+            has_partners = self.indptr[start+1:stop+1] > self.indptr[start:stop]
+            counts[start:stop][has_partners] = np.add.reduceat(infected_partner, row_starts[has_partners])
+        return counts
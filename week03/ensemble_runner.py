@@ -0,0 +1,114 @@
+# Running an ensemble of simulations in parallel.
+# Each Config object (see config_class_example.py) describes one complete simulation, so an ensemble is just a list of
+# them. Here we hand the configs out to a pool of worker processes, each of which runs the toy model
+# (infection_toy_model.py) and sends back only its summary statistics; the populations themselves stay in the workers.
+# Results can also be kept in a ResultCache (see result_cache.py), so that running an ensemble again only runs the
+# configurations which have not been run before.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from infection_toy_model import Parameters, simulate
+from result_cache import result_key
+
+
+def run_config(config, seed):
+    """Run the toy model for one Config, using a random number generator seeded from `seed`.
+
+    Returns a dictionary mapping each summary statistic to an array with one value per time step.
+    """
+    rng = np.random.default_rng(seed)
+    results = simulate(config.population_size, Parameters.from_config(config), rng=rng, verbose=False)
+    return {key: np.array([stats[key] for stats in results]) for key in results[0]}
+
+
+def _run_task(task):
+    # Pool workers are given one (config, seed) pair at a time, so unpack it here
+    return run_config(*task)
+
+
+def config_seeds(configs, seed=None):
+    """A np.random.SeedSequence for each config, made from `seed` and the config's hash.
+
+    A config's seed does not depend on where it is in the list, so adding, removing or reordering configs does not
+    change the seeds (or the cached results) of the others. Configs which appear more than once are told apart by
+    counting them: the first copy gets repeat 0, the next repeat 1, and so on.
+    """
+    entropy = np.random.SeedSequence(seed).entropy
+    repeats = {}
+    seeds = []
+    for config in configs:
+        config_hash = config.config_hash()
+        repeat = repeats.get(config_hash, 0)
+        repeats[config_hash] = repeat + 1
+        seeds.append(np.random.SeedSequence(entropy, spawn_key=(int(config_hash[:16], 16), repeat)))
+    return seeds
+
+
+def run_ensemble(configs, workers=None, seed=None, cache=None):
+    """Run the toy model for every Config in `configs`, returning the results of run_config in the same order.
+
+    workers is the number of processes to use (by default one per CPU); workers=1 runs everything in this process.
+    Each run gets its own independent seed (see config_seeds), so an ensemble can be reproduced by passing the same
+    seed.
+
+    If a ResultCache is given, runs whose results are already in it are not run again, and the results of the new
+    runs are added to it. The cache is only used when a seed is given, since otherwise every run is different.
+    """
+    return list(iter_ensemble(configs, workers, seed, cache))
+
+
+def iter_ensemble(configs, workers=None, seed=None, cache=None):
+    """Like run_ensemble, but yields the results one run at a time (in order) as they are ready.
+
+    Nothing keeps the results after they have been yielded, so large ensembles can be summarised as they run (see
+    ensemble_summary.py) without holding every run in memory.
+    """
+    tasks = list(zip(configs, config_seeds(configs, seed)))
+    if workers is None:
+        workers = os.cpu_count()
+
+    if cache is None or seed is None:
+        yield from _run_tasks(tasks, workers)
+        return
+
+    keys = [result_key(config, task_seed) for config, task_seed in tasks]
+    missing = [i for i, key in enumerate(keys) if not os.path.exists(cache.path(key))]
+    new_results = _run_tasks([tasks[i] for i in missing], workers)
+    missing = set(missing)
+    for i, key in enumerate(keys):
+        if i in missing:
+            result = next(new_results)
+            cache.put(key, result, evict=False)
+        else:
+            result = cache.get(key)
+            if result is None:  # deleted since we looked
+                result = _run_task(tasks[i])
+        yield result
+    if missing:
+        cache.evict()
+
+
+def _run_tasks(tasks, workers):
+    """Yield the result of each task in order."""
+    if workers == 1 or len(tasks) <= 1:
+        yield from map(_run_task, tasks)
+        return
+
+    # Sending tasks to the workers in batches keeps the overhead low for ensembles of thousands of short runs,
+    # while still leaving several batches per worker to even out the load.
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_run_task, tasks, chunksize=chunksize)
+
+
+if __name__ == "__main__":
+    from config_class_example import Config
+
+    cfg_list = [Config(num_people=1000, infectious_period=3, sim_time=100) for i in range(20)]
+    ensemble = run_ensemble(cfg_list, workers=4, seed=42)
+    for cfg, result in zip(cfg_list, ensemble):
+        print(f"Rate per infected contact = {cfg.rate_per_infected_contact}, "
+              f"Peak infected = {result['infected'].max()}")
@@ -0,0 +1,154 @@
+# Summarising an ensemble of runs without keeping all of them.
+# To see how the results of an ensemble vary, we usually want the mean and spread, and the median and some quantiles,
+# of each statistic at each time step, rather than a line for every run. Working these out with np.mean or
+# np.quantile would need every run in memory at once, which for 10,000 runs of a long simulation is a lot.
+# EnsembleSummary instead updates its summaries as each run finishes, and then forgets the run:
+# - the mean and variance with Welford's online algorithm, which is exact
+# - each quantile with the P-squared ("P2") algorithm (Jain and Chlamtac, 1985), which estimates a quantile from five
+#   "markers" that are moved as each value arrives, so it needs a fixed amount of memory however many runs there are.
+#   The estimates are approximate, but close to np.quantile once there are more than a few hundred runs.
+# Every time step is updated at once with whole-array operations, so adding a run costs about the same whatever the
+# simulation time.
+#
+# For example, with iter_ensemble from ensemble_runner.py:
+#   summary = EnsembleSummary()
+#   for result in iter_ensemble(cfg_list, seed=42):
+#       summary.add(result)
+#   summary.plot("infected")
+
+import numpy as np
+
+
+class QuantileSketch:
+    def __init__(self, quantiles, length):
+        """Estimates of each of `quantiles` (between 0 and 1) for each of `length` positions (e.g. time steps)."""
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        self.length = length
+        self.count = 0
+        self._first = np.empty((5, length))  # the first five values, which start the markers off
+        # The markers for each quantile at each position: their heights (the estimates), their positions, the
+        # positions they should be at, and how much those change with each new value. Markers are numbered 0 to 4;
+        # marker 2 is the estimate of the quantile and markers 0 and 4 are the smallest and largest values.
+        p = self.quantiles[:, None]
+        self._heights = np.empty((len(self.quantiles), length, 5))
+        self._positions = np.tile(np.arange(5.0), (len(self.quantiles), length, 1))
+        self._desired = np.repeat(np.stack([0 * p, 2 * p, 4 * p, 2 + 2 * p, 4 + 0 * p], axis=-1), length, axis=1)
+        self._increments = np.stack([0 * p, p / 2, p, (1 + p) / 2, 1 + 0 * p], axis=-1)
+
+    def add(self, values):
+        """Add one value for each position."""
+        values = np.asarray(values, dtype=float)
+        if self.count < 5:
+            self._first[self.count] = values
+            self.count += 1
+            if self.count == 5:
+                self._heights[:] = np.sort(self._first, axis=0).T
+            return
+        self.count += 1
+
+        q, n = self._heights, self._positions
+        x = np.broadcast_to(values[None, :], q.shape[:2])
+
+        # Find the cell k (0 to 3) between markers k and k+1 which the new value falls in, stretching the end markers
+        # if it is below the lowest or above the highest
+        q[..., 0] = np.minimum(q[..., 0], x)
+        q[..., 4] = np.maximum(q[..., 4], x)
+        k = np.sum(x[..., None] >= q[..., 1:4], axis=-1)
+
+        # Every marker above that cell moves up one position
+        n += np.arange(5) > k[..., None]
+        self._desired += self._increments
+
+        # Move the middle markers one position towards where they should be, if they are far enough from it
+        for i in (1, 2, 3):
+            d = self._desired[..., i] - n[..., i]
+            move = ((d >= 1) & (n[..., i + 1] - n[..., i] > 1)) | ((d <= -1) & (n[..., i - 1] - n[..., i] < -1))
+            if not move.any():
+                continue
+            d = np.where(move, np.sign(d), 0)
+            parabolic = q[..., i] + d / (n[..., i + 1] - n[..., i - 1]) * (
+                (n[..., i] - n[..., i - 1] + d) * (q[..., i + 1] - q[..., i]) / (n[..., i + 1] - n[..., i])
+                + (n[..., i + 1] - n[..., i] - d) * (q[..., i] - q[..., i - 1]) / (n[..., i] - n[..., i - 1])
+            )
+            # If the parabolic estimate falls outside its neighbours, move along a straight line instead
+            neighbour = np.where(d > 0, i + 1, i - 1)
+            q_neighbour = np.take_along_axis(q, neighbour[..., None], axis=-1)[..., 0]
+            n_neighbour = np.take_along_axis(n, neighbour[..., None], axis=-1)[..., 0]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                linear = q[..., i] + d * (q_neighbour - q[..., i]) / (n_neighbour - n[..., i])
+            between = (q[..., i - 1] < parabolic) & (parabolic < q[..., i + 1])
+            q[..., i] = np.where(move, np.where(between, parabolic, linear), q[..., i])
+            n[..., i] += d
+
+    def estimates(self):
+        """An array of shape (number of quantiles, length) with the estimate of each quantile at each position."""
+        if self.count == 0:
+            return np.full((len(self.quantiles), self.length), np.nan)
+        if self.count < 5:
+            return np.quantile(self._first[:self.count], self.quantiles, axis=0)
+        return self._heights[..., 2].copy()
+
+
+class EnsembleSummary:
+    def __init__(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        self.quantiles = tuple(quantiles)
+        self.count = 0
+        self.length = None
+        self._mean = {}
+        self._sum_squares = {}  # sum of squared differences from the mean, as in Welford's algorithm
+        self._sketches = {}
+
+    def add(self, results):
+        """Add the results of one run: a dictionary of arrays with one value per time step (as returned by
+        run_config in ensemble_runner.py), or a list of summary statistics for each step (as returned by simulate)."""
+        if isinstance(results, list):
+            results = {key: [stats[key] for stats in results] for key in results[0]}
+        if self.length is None:
+            self.length = len(next(iter(results.values())))
+            for key in results:
+                self._mean[key] = np.zeros(self.length)
+                self._sum_squares[key] = np.zeros(self.length)
+                self._sketches[key] = QuantileSketch(self.quantiles, self.length)
+
+        self.count += 1
+        for key in self._mean:
+            values = np.asarray(results[key], dtype=float)
+            if len(values) != self.length:
+                raise ValueError(f"All runs must have the same length: expected {self.length}, got {len(values)}")
+            delta = values - self._mean[key]
+            self._mean[key] += delta / self.count
+            self._sum_squares[key] += delta * (values - self._mean[key])
+            self._sketches[key].add(values)
+
+    def add_batch(self, results):
+        """Add several runs at once, given as a dictionary of arrays with one row per run (as returned by
+        simulate_batch in batched_model.py)."""
+        for r in range(len(next(iter(results.values())))):
+            self.add({key: values[r] for key, values in results.items()})
+
+    def keys(self):
+        return list(self._mean)
+
+    def mean(self, key):
+        return self._mean[key].copy()
+
+    def variance(self, key):
+        """The sample variance at each time step (nan until there are two runs)."""
+        if self.count < 2:
+            return np.full(self.length, np.nan)
+        return self._sum_squares[key] / (self.count - 1)
+
+    def std(self, key):
+        return np.sqrt(self.variance(key))
+
+    def quantile(self, key, q):
+        """The estimate of quantile q (one of the quantiles the summary was created with) at each time step."""
+        return self._sketches[key].estimates()[self.quantiles.index(q)]
+
+    def median(self, key):
+        return self.quantile(key, 0.5)
+
+    def plot(self, key, x=None, label=None):
+        """Plot the median, mean and quantile bands of one statistic (see plotting.py)."""
+        import plotting  # only loaded the first time something is plotted, see plotting.py
+        plotting.plot_ensemble_summary(self, key, x, label)
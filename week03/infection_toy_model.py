@@ -7,7 +7,9 @@
 # to avoid re-doing this logic!
 
 import numpy as np
-import matplotlib.pyplot as plt
+
+from contact_network import ContactNetwork
+from instrumentation import PrintFirstPeople, end_step, phase
 
 # Parameters that control the simulation
 population_size = 1000
@@ -16,126 +18,535 @@ duration_of_infectivity = 2  #  Assume 2 time periods (this needs to be >1)
 contact_number_parameter = 8  # Parameter determining the distribution of number of contacts per person
 initial_prevalence_in_contacts = 0.01  # No contacts are infected at time 0 at start of the simulation
 simulation_time = 20  # How many steps to simulate the population for
+infection_sampling = "binomial"  # How update() draws infections: "binomial" (fast) or "per_contact" (reference)
+debug_aggregates = False  # Recount the population in summarise() to check the tracked totals (slow, for debugging)
+
+
+# A time of infection of NO_TIME means "not currently infected" (the Person API shows this as None), and an
+# infected_contacts value of NO_COUNT means "not counted this step" (also None in the Person API).
+NO_TIME = -1
+NO_COUNT = -1
+
+
+# The parameters above are the defaults. To run the model with other values (for example an ensemble of Config
+# objects from config_class_example.py) we collect them into a Parameters object, which travels with the population.
+class Parameters:
+    names = ("rate_per_infected_contact", "duration_of_infectivity", "contact_number_parameter",
+             "initial_prevalence_in_contacts", "simulation_time")
+
+    def __init__(self, rate_per_infected_contact=None, duration_of_infectivity=None, contact_number_parameter=None,
+                 initial_prevalence_in_contacts=None, simulation_time=None):
+        """Any parameter which is not given takes the module-level value."""
+        self.rate_per_infected_contact = _default(rate_per_infected_contact, "rate_per_infected_contact")
+        self.duration_of_infectivity = _default(duration_of_infectivity, "duration_of_infectivity")
+        self.contact_number_parameter = _default(contact_number_parameter, "contact_number_parameter")
+        self.initial_prevalence_in_contacts = _default(initial_prevalence_in_contacts, "initial_prevalence_in_contacts")
+        self.simulation_time = _default(simulation_time, "simulation_time")
+
+    @classmethod
+    def from_config(cls, config):
+        """Take the parameters from a Config object (see config_class_example.py)."""
+        return cls(
+            rate_per_infected_contact=config.rate_per_infected_contact,
+            duration_of_infectivity=config.infectious_period,
+            contact_number_parameter=config.contact_number_parameter,
+            initial_prevalence_in_contacts=config.initial_prevalence_in_contacts,
+            simulation_time=config.simulation_time,
+        )
+
+
+def _default(value, name):
+    return globals()[name] if value is None else value
+
+
+# Running totals over a population. Rather than adding up the whole population every time we need one of these,
+# the Population updates them whenever someone is infected or recovers, so they cost nothing to read.
+class Aggregates:
+    def __init__(self, contacts=0, contacts_if_infected=0, infected=0, new_infections=0):
+        self.contacts = contacts
+        self.contacts_if_infected = contacts_if_infected
+        self.infected = infected
+        self.new_infections = new_infections
+
+    @classmethod
+    def recount(cls, population):
+        """Compute the totals from scratch by scanning every person."""
+        return cls(
+            contacts=int(population.contacts.sum()),
+            contacts_if_infected=int(population.contacts[population.infected].sum()),
+            infected=int(np.count_nonzero(population.infected)),
+            new_infections=int(np.count_nonzero(population.new_infection)),
+        )
+
+    def as_dict(self):
+        return {
+            "contacts": self.contacts,
+            "contacts_if_infected": self.contacts_if_infected,
+            "infected": self.infected,
+            "new_infections": self.new_infections,
+        }
+
+
+# The population is stored "column by column" (see Version 1 in introduction.py): there is one NumPy array for each
+# attribute, and person i is row i of every array. This lets update() and summarise() work on the whole population
+# at once instead of looping over people in Python, which matters once the population has millions of people.
+# The population also holds the Parameters for its run and the random number generator used to update it; rng can
+# be a np.random.Generator, and defaults to the np.random module itself (so np.random.seed still works).
+class Population:
+    def __init__(self, size, params=None, rng=None):
+        """Create the columns for a population of `size` people, none of them infected."""
+        self.size = size
+        self.params = params if params is not None else Parameters()
+        self.rng = rng if rng is not None else np.random
+        self.infected = np.zeros(size, dtype=bool)
+        self.time_of_infection = np.full(size, NO_TIME, dtype=np.int64)
+        self.ever_infected = np.zeros(size, dtype=bool)
+        self.new_infection = np.zeros(size, dtype=bool)
+
+        self.contacts = self.rng.poisson(self.params.contact_number_parameter, size)
+        self.infected_contacts = np.zeros(size, dtype=np.int64)
+
+        self.network = None  # a ContactNetwork, if infection should only spread along partnerships
+        self._start_tracking()
+
+    # The names of the columns which together hold the state of every person
+    column_names = ("infected", "time_of_infection", "ever_infected", "new_infection", "contacts", "infected_contacts")
+
+    @classmethod
+    def from_columns(cls, columns, params=None, rng=None):
+        """Rebuild a population from a dictionary of columns (such as one returned by the columns() method)."""
+        population = cls.__new__(cls)
+        population.params = params if params is not None else Parameters()
+        population.rng = rng if rng is not None else np.random
+        for name in cls.column_names:
+            setattr(population, name, np.asarray(columns[name]))
+        population.size = len(population.infected)
+        population.network = None
+        population._start_tracking()
+        return population
+
+    # As well as the columns, the population keeps some bookkeeping so that each step only has to look at the people
+    # who can actually change:
+    # - the aggregates (running totals, see Aggregates above)
+    # - the rows flagged as new infections, so they can be cleared without a full scan, and the rows made infected by
+    #   hand (through set_value), whose infected_contacts must be reset at the next step just like new infections
+    # - an index of the people who may still be susceptible; once someone has been infected they are dropped from it
+    # - a "recovery calendar": for each future time step, the people who were infected duration_of_infectivity
+    #   steps earlier and so are due to recover then
+    def _start_tracking(self):
+        """Set up the bookkeeping from the current columns."""
+        self.aggregates = Aggregates.recount(self)
+        self._new_infection_rows = [np.flatnonzero(self.new_infection)]
+        self._infected_by_hand_rows = []
+        self._susceptible = np.flatnonzero(~self.ever_infected)
+
+        self._recovery_calendar = {}
+        infected = np.flatnonzero(self.infected)
+        due = self.time_of_infection[infected] + self.params.duration_of_infectivity
+        order = np.argsort(due, kind="stable")
+        due_times, starts = np.unique(due[order], return_index=True)
+        for due_time, rows in zip(due_times.tolist(), np.split(infected[order], starts[1:])):
+            self._recovery_calendar[due_time] = [rows]
+
+    def columns(self):
+        """Get a dictionary of all the columns, keyed by name."""
+        return {name: getattr(self, name) for name in self.column_names}
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """Get a Person object for one row, e.g. population[0].infected"""
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError("population index out of range")
+        return Person(self, index)
+
+    def __iter__(self):
+        return (Person(self, i) for i in range(self.size))
+
+    def infect(self, index, time):
+        """Infect the person (or array of people) at `index` at the given time."""
+        index = np.atleast_1d(index)
+        self._set_infected(index, True)
+        self._set_new_infection(index, True)
+        self.time_of_infection[index] = time
+        self.ever_infected[index] = True
+        self._recovery_calendar.setdefault(time + self.params.duration_of_infectivity, []).append(index)
+
+    def recover(self, index):
+        """The person (or array of people) at `index` is no longer infected."""
+        index = np.atleast_1d(index)
+        self._set_infected(index, False)
+        self.time_of_infection[index] = NO_TIME
+
+    def clear_new_infections(self):
+        """Reset new_infection for everyone flagged since the last call, returning their rows."""
+        rows = np.concatenate(self._new_infection_rows) if self._new_infection_rows else np.array([], dtype=int)
+        self.new_infection[rows] = False
+        self._new_infection_rows = []
+        self.aggregates.new_infections = 0
+        return rows
+
+    def clear_infected_by_hand(self):
+        """The rows made infected through set_value since the last call."""
+        rows = np.concatenate(self._infected_by_hand_rows) if self._infected_by_hand_rows else np.array([], dtype=int)
+        self._infected_by_hand_rows = []
+        return rows
+
+    def due_to_recover(self, time):
+        """The people who are infected and were infected exactly duration_of_infectivity steps before `time`."""
+        rows = self._recovery_calendar.pop(time, [])
+        # (a person can be in the calendar more than once if their infection was set by hand, so drop repeats)
+        rows = np.unique(np.concatenate(rows)) if rows else np.array([], dtype=int)
+        # Someone's infection may have been changed since they were put in the calendar, so check it is still due
+        due = self.infected[rows] & ((time - self.time_of_infection[rows]) == self.params.duration_of_infectivity)
+        return rows[due]
+
+    def susceptible_people(self):
+        """The people who have never been infected, and so can be infected now."""
+        # Drop everyone who has been infected since the last call from the index (people are only added back to it
+        # if their ever_infected flag is cleared by hand, see set_value)
+        self._susceptible = self._susceptible[~self.ever_infected[self._susceptible]]
+        return self._susceptible[~self.infected[self._susceptible]]
+
+    def set_value(self, name, index, value):
+        """Set one attribute for one person, keeping the aggregates up to date."""
+        if name == "infected":
+            self._set_infected(np.atleast_1d(index), value)
+            if value:
+                self._infected_by_hand_rows.append(np.atleast_1d(index))
+        elif name == "new_infection":
+            self._set_new_infection(np.atleast_1d(index), value)
+        elif name == "contacts":
+            change = value - self.contacts[index]
+            self.aggregates.contacts += int(change)
+            if self.infected[index]:
+                self.aggregates.contacts_if_infected += int(change)
+            self.contacts[index] = value
+        else:
+            getattr(self, name)[index] = value
+
+        # Someone whose ever_infected flag is cleared by hand can be infected again, so they go back in the susceptible
+        # index
+        if name == "ever_infected" and not value:
+            self._susceptible = np.union1d(self._susceptible, np.atleast_1d(index))
+
+        # Someone made infected (or given a new time of infection) by hand must also go in the recovery calendar
+        infected_with_time = self.infected[index] and self.time_of_infection[index] != NO_TIME
+        if name in ("infected", "time_of_infection") and infected_with_time:
+            due = int(self.time_of_infection[index]) + self.params.duration_of_infectivity
+            self._recovery_calendar.setdefault(due, []).append(np.atleast_1d(index))
+
+    def check_aggregates(self):
+        """Check the tracked aggregates against a full recount of the population."""
+        tracked = self.aggregates.as_dict()
+        counted = Aggregates.recount(self).as_dict()
+        assert tracked == counted, f"Tracked aggregates {tracked} do not match recount {counted}"
+
+    def _set_infected(self, index, value):
+        changing = index[self.infected[index] != value]
+        sign = 1 if value else -1
+        self.aggregates.infected += sign * len(changing)
+        self.aggregates.contacts_if_infected += sign * int(self.contacts[changing].sum())
+        self.infected[changing] = value
+
+    def _set_new_infection(self, index, value):
+        changing = index[self.new_infection[index] != value]
+        if value:
+            self.aggregates.new_infections += len(changing)
+            self._new_infection_rows.append(changing)
+        else:
+            self.aggregates.new_infections -= len(changing)
+        self.new_infection[changing] = value
+
+
+# A Person which is not part of a population keeps its three yes/no attributes as bits of one small integer
+_flag_bits = {"infected": 1, "ever_infected": 2, "new_infection": 4}
+
+
+def _column(name, missing=None):
+    """Property reading/writing one row of a Population column; `missing` is the sentinel shown as None.
+
+    For a Person on its own the value is kept on the Person itself: a bit of _flags, or the slot named "_" + name.
+    """
+    bit = _flag_bits.get(name)
+    slot = "_" + name
+
+    def get_value(person):
+        if person._population is None:
+            if bit is not None:
+                return bool(person._flags & bit)
+            value = getattr(person, slot)
+        else:
+            value = getattr(person._population, name)[person._index].item()
+        return None if (missing is not None and value == missing) else value
+
+    def set_value(person, value):
+        if value is None:
+            value = missing
+        if person._population is None:
+            if bit is not None:
+                person._flags = person._flags | bit if value else person._flags & ~bit
+            else:
+                setattr(person, slot, value)
+        else:
+            person._population.set_value(name, person._index, value)
+
+    return property(get_value, set_value)
 
 
 # This is a template for an 'object'; variables and functions are defined inside the class and are accessed using a '.' syntax e.g. x.infected = True
 # 'self' is used to refer to each object's individual variables which are independent of other "Person" objects
+# A Person is a "view" of one row of a Population: reading or setting person.infected reads or sets that row of the
+# population's infected column. A Person created on its own, with Person(), holds its own values instead.
+# __slots__ fixes the attributes a Person can have, so Python does not give every Person a dictionary of attributes.
+# This keeps each Person small (see benchmarks/person_memory.py), which matters when there are millions of them.
 class Person:
-    def __init__(self):  # This assigns values to the variables below for each person at the start of each period
-        """Initialise a new person."""
-        self.infected = False
-        self.time_of_infection = None
-        self.ever_infected = False
-        self.new_infection = False
+    __slots__ = ("_population", "_index", "_flags", "_time_of_infection", "_contacts", "_infected_contacts")
 
-        self.contacts = np.random.poisson(contact_number_parameter)
-        self.infected_contacts = 0
+    def __init__(self, population=None, index=0):
+        """Initialise a new person, or a view of person `index` in an existing population."""
+        self._population = population
+        self._index = index
+        if population is None:
+            self._flags = 0
+            self._time_of_infection = NO_TIME
+            self._contacts = int(np.random.poisson(contact_number_parameter))
+            self._infected_contacts = 0
+
+    infected = _column("infected")
+    time_of_infection = _column("time_of_infection", missing=NO_TIME)
+    ever_infected = _column("ever_infected")
+    new_infection = _column("new_infection")
+    contacts = _column("contacts")
+    infected_contacts = _column("infected_contacts", missing=NO_COUNT)
+
+    @property
+    def contacts_if_infected(self):
+        """contacts_if_infected is the number of contacts a person with infection has"""
+        return self.contacts if self.infected else 0
 
     def data_string(self):
         return f"Infected: {self.infected}, Time of infection: {self.time_of_infection}, Ever infected: {self.ever_infected}, Infected Contacts: {self.infected_contacts}"
 
     def infect(self, time):
-        self.infected = True
-        self.time_of_infection = time
-        self.ever_infected = True
-        self.new_infection = True
+        if self._population is None:
+            self._flags = _flag_bits["infected"] | _flag_bits["ever_infected"] | _flag_bits["new_infection"]
+            self._time_of_infection = time
+        else:
+            self._population.infect(self._index, time)
+
 
+def initialise_population(population_size, params=None, rng=None, network=False):
+    """Create a population with only one person infected.
 
-def initialise_population(population_size):
-    """Create a population with only one person infected."""
-    population = [Person() for _ in range(population_size)]
-    population[0].infect(0)  # infect the first person
+    With network=True, each person is also given actual partners (see contact_network.py), and update() will only
+    let infection spread between partners.
+    """
+    population = Population(population_size, params, rng)
+    if network:
+        population.network = ContactNetwork.from_contacts(population.contacts, population.rng)
+    population.infect(0, 0)  # infect the first person
     return population
 
 
 def summarise(population):
-    stats = {
-        "contacts": sum(person.contacts for person in population),
-        "contacts_if_infected":  sum(person.contacts for person in population if person.infected),
-        "infected": sum(person.infected for person in population),
-        "new_infections": sum(person.new_infection for person in population)
-
-    }
+    if debug_aggregates:
+        population.check_aggregates()
+    stats = population.aggregates.as_dict()
     stats["prevalence_in_contacts"] = stats["contacts_if_infected"] / stats["contacts"]
     stats["overall prevalence"] = stats["infected"] / len(population)
 
     return stats
 
 
-def update(population, time):
+def _count_successes(trials, probability, rng):
+    """For each entry of `trials`, count how many of that many uniform draws fall below `probability`.
+
+    All the draws are made in one call; np.bincount then adds up the successes belonging to each entry.
+    """
+    owner = np.repeat(np.arange(len(trials)), trials)
+    successes = rng.uniform(size=len(owner)) < probability
+    return np.bincount(owner, weights=successes, minlength=len(trials)).astype(np.int64)
+
+
+def _sample_per_contact(contacts, prevalence_in_contacts, rate_per_infected_contact, rng):
+    """Reference sampling: one draw per contact, then one draw per infected contact.
+
+    Returns the number of infected contacts and whether each person is infected.
+    """
+    infected_contacts = _count_successes(contacts, prevalence_in_contacts, rng)
+    # a person is infected if any of the draws for their infected contacts succeeds
+    newly_infected = _count_successes(infected_contacts, rate_per_infected_contact, rng) > 0
+    return infected_contacts, newly_infected
+
+
+def _sample_binomial(contacts, prevalence_in_contacts, rate_per_infected_contact, rng):
+    """Closed-form sampling with the same distribution as _sample_per_contact, but two draws per person.
+
+    The number of infected contacts among n contacts is Binomial(n, prevalence_in_contacts), and a person with k
+    infected contacts avoids infection with probability (1 - rate_per_infected_contact)**k.
+    """
+    infected_contacts = rng.binomial(contacts, prevalence_in_contacts)
+    prob_infection = 1 - (1 - rate_per_infected_contact)**infected_contacts
+    newly_infected = rng.uniform(size=len(contacts)) < prob_infection
+    return infected_contacts, newly_infected
+
+
+samplers = {
+    "per_contact": _sample_per_contact,
+    "binomial": _sample_binomial,
+}
+
+
+def _sample_network(population, susceptible, rate_per_infected_contact):
+    """Count each susceptible person's infected partners in the contact network, then draw whether they are infected
+    (each infected partner independently infects them with probability rate_per_infected_contact)."""
+    infected_contacts = population.network.count_infected_partners(population.infected)[susceptible]
+    prob_infection = 1 - (1 - rate_per_infected_contact)**infected_contacts
+    newly_infected = population.rng.uniform(size=len(susceptible)) < prob_infection
+    return infected_contacts, newly_infected
+
+
+def _start_step(population, time):
+    """The parts of an update which involve no new infections: clearing last step's flags and recoveries."""
+    # People who are infected have no infected contacts counted (they were all new infections at an earlier step, or
+    # were made infected by hand since), and recover after duration_of_infectivity
+    previous_infections = np.concatenate([population.clear_new_infections(), population.clear_infected_by_hand()])
+    population.infected_contacts[previous_infections[population.infected[previous_infections]]] = NO_COUNT
+    population.recover(population.due_to_recover(time))
+
+
+def update(population, time, sampling=None, backend=None):
+    """Advance the population by one time step.
+
+    sampling chooses how infections are drawn (see samplers); by default infection_sampling is used. If the population
+    has a contact network, infection spreads along it instead (except at time 0, when there is no data yet).
+    backend, if given, is the name of a kernel backend from kernels.py ("python", "numpy", "numba" or "auto") which
+    does the whole step instead; it draws its own random numbers, so sampling is not used.
+    """
+    params = population.params
+
     if time == 0:
         # At the start of the simulation, use a predefined value as we have no data
-        prevalence_in_contacts = initial_prevalence_in_contacts
+        prevalence_in_contacts = params.initial_prevalence_in_contacts
     else:
         prevalence_in_contacts = (
-            sum(person.contacts for person in population if person.infected)
-            / sum(person.contacts for person in population)
+            population.aggregates.contacts_if_infected
+            / population.aggregates.contacts
         )
 
-    for person in population:
-        person.new_infection = False
-
-        if person.infected:
-            person.infected_contacts = None
-            if (time - person.time_of_infection) == duration_of_infectivity:
-                person.infected = False
-                person.time_of_infection = None
-
-        if not person.infected and not person.ever_infected:
-            # First calculate number of infected contacts
-            person.infected_contacts = 0
-            for i in range(person.contacts):
-                e = np.random.uniform()
-                if e < prevalence_in_contacts:
-                    person.infected_contacts = person.infected_contacts + 1
-            # Then calculate risk of infection per infected contact
-            for i in range(person.infected_contacts):
-                e = np.random.uniform()
-                if e < rate_per_infected_contact:
-                    person.infect(time)
-                    break
-
-        # contacts_if_infected is the number of contacts a person with infection has
-        person.contacts_if_infected = person.contacts if person.infected else 0
-
-
-def simulate(population_size):
+    if backend is not None:
+        if population.network is not None:
+            raise ValueError("The kernel backends do not support contact networks")
+        import kernels  # kernels.py imports this file, so it is only imported when a backend is used
+        kernels.update_columns(kernels.get_backend(backend), population, time, prevalence_in_contacts)
+        return
+
+    sample_infections = samplers[sampling or infection_sampling]
+
+    _start_step(population, time)
+
+    # Only people who have never been infected can be infected
+    susceptible = population.susceptible_people()
+    # Calculate number of infected contacts, then whether those contacts lead to infection
+    if population.network is not None and time > 0:
+        infected_contacts, newly_infected = _sample_network(population, susceptible, params.rate_per_infected_contact)
+    else:
+        infected_contacts, newly_infected = sample_infections(
+            population.contacts[susceptible], prevalence_in_contacts, params.rate_per_infected_contact, population.rng
+        )
+    population.infected_contacts[susceptible] = infected_contacts
+    population.infect(susceptible[newly_infected], time)
+
+
+def simulate(population_size, params=None, rng=None, verbose=True, hooks=(), network=False, stop_early=True,
+             keep_results=True, backend=None):
+    """Run the model, returning the summary statistics for each time step.
+
+    params (a Parameters object), rng and network are passed on to initialise_population. hooks are told about each
+    phase of the simulation (see instrumentation.py); verbose=True adds a hook printing the first 10 people at the
+    first 10 steps.
+
+    Once no more infections are possible the rest of the run is known without simulating it (see
+    _finish_without_infections). With stop_early=True those steps are filled in directly; the results are the same,
+    but every row has an "extrapolated" entry saying whether it was filled in like this.
+
+    With keep_results=False nothing is kept and None is returned; use a hook to collect the results instead (e.g. a
+    StreamingWriter from streaming_output.py, which writes them to a file as the simulation runs).
+
+    backend is passed on to update(), to advance the population with one of the kernels in kernels.py.
+    """
+    hooks = list(hooks)
+    if verbose:
+        hooks.append(PrintFirstPeople())
+
     results = []  # the outputs we will compute
-    population = initialise_population(population_size)
-    results.append(summarise(population))
-    printing_time = 10
-    for t in range(1, simulation_time):
-        update(population, t)
+    with phase(hooks, "initialise", 0):
+        population = initialise_population(population_size, params, rng, network)
+    with phase(hooks, "summarise", 0):
         stats = summarise(population)
-        results.append(stats)
-        if(t < printing_time):
-          print("\nTime = ", t, "\tPrevalence in contacts = ", round(stats["prevalence_in_contacts"],3), "\tOverall prevalence", stats["overall prevalence"])
-          for i in range (10):
-            print("\t", i, population[i].data_string())
-    return results
+        if stop_early:
+            stats["extrapolated"] = False
+        if keep_results:
+            results.append(stats)
+    if hooks:
+        end_step(hooks, population, 0, stats)
+
+    for t in range(1, population.params.simulation_time):
+        if stop_early and _burned_out(population, stats):
+            remaining = _finish_without_infections(population, stats, t, hooks)
+            if keep_results:
+                results.extend(remaining)
+            break
+        with phase(hooks, "update", t):
+            update(population, t, backend=backend)
+        with phase(hooks, "summarise", t):
+            stats = summarise(population)
+            if stop_early:
+                stats["extrapolated"] = False
+            if keep_results:
+                results.append(stats)
+        if hooks:
+            end_step(hooks, population, t, stats)
+
+    return results if keep_results else None
+
+
+def _burned_out(population, stats):
+    """Whether the epidemic is over: nobody is infected, or there is nobody left who could be infected.
+
+    (This relies on prevalence_in_contacts coming from the population, which is the case at every step after 0.)
+    """
+    return stats["infected"] == 0 or len(population.susceptible_people()) == 0
+
+
+def _finish_without_infections(population, stats, start, hooks):
+    """The results from time `start` to the end of the simulation, once no more infections can happen.
+
+    Nobody new can be infected, so no random numbers are needed: the people still infected recover when the
+    recovery calendar says they will, and once nobody is infected every remaining row is the same.
+    """
+    remaining = []
+    for t in range(start, population.params.simulation_time):
+        if stats["infected"] > 0:
+            _start_step(population, t)
+            stats = summarise(population)
+        else:
+            stats = dict(stats)
+        stats["extrapolated"] = True
+        remaining.append(stats)
+        if hooks:
+            end_step(hooks, population, t, stats)
+    return remaining
 
 
 def plot_results(results):
-    times = range(0, simulation_time)
-    tick = 2
-
-    plt.plot(times, [result["infected"] for result in results], 'x-', label='Total active')
-    plt.plot(times, [result["new_infections"] for result in results], 'o-', label='New')
-    plt.xticks(range(0, simulation_time, tick))
-    plt.xlabel("Time")
-    plt.ylabel("Number")
-    plt.title("Infections")
-    plt.legend()
-    plt.show()
-
-    plt.plot(times, [result["prevalence_in_contacts"]*100 for result in results], 'x-', label="Prevalence in Contacts")
-    plt.plot(times, [result["overall prevalence"]*100 for result in results], 'o-', label="Overall Prevalence")
-    plt.title("Prevalence of Infection")
-    plt.ylabel("Prevalence %")
-    plt.xlabel("Time")
-    plt.xticks(range(0, simulation_time, tick))
-    plt.legend()
-    plt.show()
+    """Plot the infections and prevalence over time (see plotting.py)."""
+    import plotting  # only loaded the first time something is plotted, see plotting.py
+    plotting.plot_results(results)
 
 
 # results = simulate(population_size)
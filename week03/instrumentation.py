@@ -0,0 +1,200 @@
+# Hooks for looking inside a running simulation.
+# simulate() in infection_toy_model.py is split into phases - "initialise", then "update" and "summarise" at every
+# time step - and it tells each hook it is given when a phase starts and ends, and when a time step is finished.
+# A hook is any object with the methods of the Hook class below, so it is easy to add new ones: timers, counters,
+# profilers, printing for debugging, writing results out as they are produced...
+# When no hooks are given, simulate() skips all of this, so it costs next to nothing.
+#
+# For example, to see which phase takes the longest:
+#   timer = PhaseTimer()
+#   simulate(population_size, hooks=[timer])
+#   print(collect_report([timer]))
+
+import contextlib
+import cProfile
+import pstats
+import time as clock
+import tracemalloc
+
+
+class Hook:
+    """Base class for hooks, which does nothing; override the methods you need."""
+
+    def start_phase(self, phase, time):
+        pass
+
+    def end_phase(self, phase, time):
+        pass
+
+    def end_step(self, population, time, stats):
+        """Called once the summary statistics for a time step have been calculated."""
+        pass
+
+    def report(self):
+        """A dictionary of whatever the hook has measured."""
+        return {}
+
+
+_no_hooks = contextlib.nullcontext()
+
+
+def phase(hooks, name, time):
+    """Context manager which tells each hook when a phase of the simulation starts and ends."""
+    if not hooks:
+        return _no_hooks
+    return _Phase(hooks, name, time)
+
+
+class _Phase:
+    def __init__(self, hooks, name, time):
+        self.hooks = hooks
+        self.name = name
+        self.time = time
+
+    def __enter__(self):
+        for hook in self.hooks:
+            hook.start_phase(self.name, self.time)
+
+    def __exit__(self, *exc_info):
+        # Hooks are told the phase has ended in reverse order, so a timer started first is stopped last
+        for hook in reversed(self.hooks):
+            hook.end_phase(self.name, self.time)
+
+
+def end_step(hooks, population, time, stats):
+    for hook in hooks:
+        hook.end_step(population, time, stats)
+
+
+def collect_report(hooks):
+    """Combine the reports of several hooks into one dictionary, keyed by the name of each hook's class."""
+    return {type(hook).__name__: hook.report() for hook in hooks}
+
+
+class PhaseTimer(Hook):
+    """Counts the calls to each phase and times them."""
+
+    def __init__(self):
+        self.calls = {}
+        self.total_time = {}
+        self.max_time = {}
+        self._started = {}
+
+    def start_phase(self, phase, time):
+        self._started[phase] = clock.perf_counter()
+
+    def end_phase(self, phase, time):
+        elapsed = clock.perf_counter() - self._started.pop(phase)
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.total_time[phase] = self.total_time.get(phase, 0.0) + elapsed
+        self.max_time[phase] = max(self.max_time.get(phase, 0.0), elapsed)
+
+    def report(self):
+        return {
+            phase: {
+                "calls": calls,
+                "total_time": self.total_time[phase],
+                "mean_time": self.total_time[phase] / calls,
+                "max_time": self.max_time[phase],
+            }
+            for phase, calls in self.calls.items()
+        }
+
+
+class Profiler(Hook):
+    """Runs cProfile during the chosen phases at the chosen time steps.
+
+    The report lists the `top` functions with the largest cumulative time for each profiled phase.
+    """
+
+    def __init__(self, steps, phases=("update",), top=20):
+        self.steps = set(steps)
+        self.phases = set(phases)
+        self.top = top
+        self.profiles = {}  # pstats.Stats for each profiled (phase, time)
+        self._profile = None
+
+    def start_phase(self, phase, time):
+        if time in self.steps and phase in self.phases:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def end_phase(self, phase, time):
+        if self._profile is not None:
+            self._profile.disable()
+            self.profiles[(phase, time)] = pstats.Stats(self._profile)
+            self._profile = None
+
+    def report(self):
+        report = {}
+        for (phase, time), stats in self.profiles.items():
+            functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:self.top]
+            report[f"{phase} at step {time}"] = [
+                {
+                    "function": f"{filename}:{line}({name})",
+                    "calls": calls,
+                    "total_time": total_time,
+                    "cumulative_time": cumulative_time,
+                }
+                for (filename, line, name), (_, calls, total_time, cumulative_time, _) in functions
+            ]
+        return report
+
+
+class MemoryTracer(Hook):
+    """Measures memory allocated (current and peak, in bytes) during the chosen phases at the chosen time steps.
+
+    By default every phase is traced. Tracing slows the code down, so use a separate hook for timing.
+    """
+
+    def __init__(self, steps, phases=None):
+        self.steps = set(steps)
+        self.phases = set(phases) if phases is not None else None
+        self.memory = {}  # (current, peak) for each traced (phase, time)
+        self._started_tracing = False
+        self._tracing = False
+
+    def start_phase(self, phase, time):
+        if time in self.steps and (self.phases is None or phase in self.phases):
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start()
+            elif hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+            else:
+                # Python 3.8 has no reset_peak, but clearing the traces resets the peak too (memory allocated before
+                # the phase is then forgotten, so freeing it during the phase doesn't count)
+                tracemalloc.clear_traces()
+            self._start_memory = tracemalloc.get_traced_memory()[0]
+            self._tracing = True
+
+    def end_phase(self, phase, time):
+        if self._tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            self.memory[(phase, time)] = (current - self._start_memory, peak - self._start_memory)
+            if self._started_tracing:
+                tracemalloc.stop()
+            self._tracing = False
+
+    def report(self):
+        return {
+            f"{phase} at step {time}": {"current": current, "peak": peak}
+            for (phase, time), (current, peak) in self.memory.items()
+        }
+
+
+class PrintFirstPeople(Hook):
+    """Prints the prevalence and the first few people at each of the first few time steps, for debugging."""
+
+    def __init__(self, printing_time=10, people=10):
+        self.printing_time = printing_time
+        self.people = people
+
+    def end_step(self, population, time, stats):
+        if 0 < time < self.printing_time:
+            # The lines are printed all at once, so the simulation only waits for the terminal once per step
+            lines = [f"\nTime =  {time} \tPrevalence in contacts =  {round(stats['prevalence_in_contacts'], 3)} "
+                     f"\tOverall prevalence {stats['overall prevalence']}"]
+            for i in range(min(self.people, len(population))):
+                lines.append(f"\t {i} {population[i].data_string()}")
+            print("\n".join(lines))
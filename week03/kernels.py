@@ -0,0 +1,246 @@
+# Interchangeable "kernels" for the update and summarise steps of the toy model.
+# A kernel works directly on the population's columns (see Population in infection_toy_model.py). The same step can
+# be written in different ways, and here there are three:
+# - "python": a plain loop over people, written like the original per-person update(). Easy to read but slow; it is
+#   the reference the others are checked against.
+# - "numba": exactly the same loop, compiled to machine code with Numba. This is as fast as NumPy (or faster) and
+#   lets us keep rules which are awkward to express with whole-array operations.
+# - "numpy": the same step written with whole-array NumPy operations.
+# get_backend("auto") picks Numba when it is installed and NumPy otherwise, so Numba is never required.
+# To run the model with a kernel, pass backend= to update() or simulate() in infection_toy_model.py.
+#
+# So that the kernels can be compared exactly, the random numbers are drawn outside them: two uniform numbers per
+# person per step, one used to draw the number of infected contacts (by inverting the binomial distribution) and one
+# to decide whether those contacts lead to infection. Anything involving pow() is also worked out beforehand, in
+# _probability_tables, so all of the kernels do exactly the same floating point operations and give identical results.
+# check_backends_agree() runs the same simulation with each kernel and checks this.
+
+import time as clock
+import warnings
+
+import numpy as np
+
+import infection_toy_model
+from infection_toy_model import NO_COUNT, NO_TIME
+
+
+def _update_loop(infected, time_of_infection, ever_infected, new_infection, contacts, infected_contacts,
+                 time, prevalence, duration, u_contacts, u_infection, start_pmf, prob_infection):
+    """Advance the columns by one time step, one person at a time."""
+    for i in range(len(infected)):
+        new_infection[i] = False
+
+        if infected[i]:
+            infected_contacts[i] = NO_COUNT
+            if time - time_of_infection[i] == duration:
+                infected[i] = False
+                time_of_infection[i] = NO_TIME
+
+        if not infected[i] and not ever_infected[i]:
+            # Number of infected contacts: the smallest k for which u_contacts[i] is below the binomial CDF at k,
+            # working up the probabilities with P(k+1) = P(k) * (n-k)/(k+1) * p/(1-p)
+            n = contacts[i]
+            k = 0
+            if prevalence >= 1:
+                k = n
+            else:
+                pmf = start_pmf[n]
+                cdf = pmf
+                while k < n and u_contacts[i] >= cdf:
+                    pmf = pmf * ((n - k) / (k + 1) * prevalence / (1 - prevalence))
+                    k += 1
+                    cdf = cdf + pmf
+            infected_contacts[i] = k
+
+            if u_infection[i] < prob_infection[k]:
+                infected[i] = True
+                time_of_infection[i] = time
+                ever_infected[i] = True
+                new_infection[i] = True
+
+
+def _summarise_loop(infected, new_infection, contacts):
+    """Add up the totals reported by summarise(), one person at a time."""
+    total_contacts = 0
+    contacts_if_infected = 0
+    total_infected = 0
+    new_infections = 0
+    for i in range(len(infected)):
+        total_contacts += contacts[i]
+        if infected[i]:
+            contacts_if_infected += contacts[i]
+            total_infected += 1
+        if new_infection[i]:
+            new_infections += 1
+    return total_contacts, contacts_if_infected, total_infected, new_infections
+
+
+def _update_numpy(infected, time_of_infection, ever_infected, new_infection, contacts, infected_contacts,
+                  time, prevalence, duration, u_contacts, u_infection, start_pmf, prob_infection):
+    """The same step as _update_loop, using whole-array operations."""
+    new_infection[:] = False
+
+    infected_contacts[infected] = NO_COUNT
+    recovering = infected & (time - time_of_infection == duration)
+    infected[recovering] = False
+    time_of_infection[recovering] = NO_TIME
+
+    susceptible = np.flatnonzero(~infected & ~ever_infected)
+    n = contacts[susceptible]
+    u = u_contacts[susceptible]
+    if prevalence >= 1:
+        k = n.copy()
+    else:
+        # Work up the binomial probabilities for everyone at once, stopping each person once their CDF passes u
+        k = np.zeros(len(susceptible), dtype=n.dtype)
+        pmf = start_pmf[n]
+        cdf = pmf.copy()
+        active = np.flatnonzero((k < n) & (u >= cdf))
+        while len(active):
+            pmf[active] = pmf[active] * ((n[active] - k[active]) / (k[active] + 1) * prevalence / (1 - prevalence))
+            k[active] += 1
+            cdf[active] = cdf[active] + pmf[active]
+            active = active[(k[active] < n[active]) & (u[active] >= cdf[active])]
+    infected_contacts[susceptible] = k
+
+    newly_infected = susceptible[u_infection[susceptible] < prob_infection[k]]
+    infected[newly_infected] = True
+    time_of_infection[newly_infected] = time
+    ever_infected[newly_infected] = True
+    new_infection[newly_infected] = True
+
+
+def _summarise_numpy(infected, new_infection, contacts):
+    return (int(contacts.sum()), int(contacts[infected].sum()), int(np.count_nonzero(infected)),
+            int(np.count_nonzero(new_infection)))
+
+
+class Backend:
+    """A named pair of update and summarise kernels."""
+
+    def __init__(self, name, update, summarise):
+        self.name = name
+        self.update = update
+        self.summarise = summarise
+
+
+def _numba_backend():
+    import numba
+    return Backend("numba", numba.njit(cache=True)(_update_loop), numba.njit(cache=True)(_summarise_loop))
+
+
+_backend_factories = {
+    "python": lambda: Backend("python", _update_loop, _summarise_loop),
+    "numpy": lambda: Backend("numpy", _update_numpy, _summarise_numpy),
+    "numba": _numba_backend,
+}
+_backends = {}  # backends which have already been created (compiling with Numba takes a few seconds)
+
+
+def available_backends():
+    """The names of the backends which can be used here."""
+    try:
+        import numba  # noqa: F401
+    except ImportError:
+        return ["python", "numpy"]
+    return ["python", "numpy", "numba"]
+
+
+def get_backend(name="auto"):
+    """Get a backend by name. "auto" means Numba if it is installed, otherwise NumPy.
+
+    Asking for "numba" when it is not installed gives a warning and the NumPy backend instead.
+    """
+    if name == "auto":
+        name = "numba" if "numba" in available_backends() else "numpy"
+    elif name == "numba" and "numba" not in available_backends():
+        warnings.warn("Numba is not installed; using the NumPy backend instead")
+        name = "numpy"
+    if name not in _backend_factories:
+        raise ValueError(f"Unknown backend {name!r}; choose from {', '.join(_backend_factories)} or 'auto'")
+    if name not in _backends:
+        _backends[name] = _backend_factories[name]()
+    return _backends[name]
+
+
+def _probability_tables(prevalence, rate_per_infected_contact, max_contacts):
+    """P(no infected contacts) for each number of contacts n, and P(infection) for each number of infected
+    contacts k, for n and k from 0 to max_contacts."""
+    counts = np.arange(max_contacts + 1)
+    start_pmf = (1 - prevalence)**counts
+    prob_infection = 1 - (1 - rate_per_infected_contact)**counts
+    return start_pmf, prob_infection
+
+
+def summarise_columns(backend, population):
+    """The same statistics as summarise() in infection_toy_model.py, calculated with a kernel."""
+    contacts, contacts_if_infected, infected, new_infections = backend.summarise(
+        population.infected, population.new_infection, population.contacts
+    )
+    stats = {
+        "contacts": int(contacts),
+        "contacts_if_infected": int(contacts_if_infected),
+        "infected": int(infected),
+        "new_infections": int(new_infections),
+    }
+    stats["prevalence_in_contacts"] = stats["contacts_if_infected"] / stats["contacts"]
+    stats["overall prevalence"] = stats["infected"] / len(population)
+    return stats
+
+
+def update_columns(backend, population, time, prevalence_in_contacts):
+    """Advance the population's columns by one time step with a kernel.
+
+    The kernel only changes the columns, so afterwards the population's running totals, susceptible index and
+    recovery calendar are rebuilt from them, and summarise() and update() can carry on as usual.
+    """
+    params = population.params
+    u_contacts = population.rng.uniform(size=len(population))
+    u_infection = population.rng.uniform(size=len(population))
+    start_pmf, prob_infection = _probability_tables(
+        prevalence_in_contacts, params.rate_per_infected_contact, int(population.contacts.max(initial=0))
+    )
+    backend.update(
+        population.infected, population.time_of_infection, population.ever_infected, population.new_infection,
+        population.contacts, population.infected_contacts,
+        time, prevalence_in_contacts, params.duration_of_infectivity, u_contacts, u_infection,
+        start_pmf, prob_infection,
+    )
+    population._start_tracking()
+
+
+def simulate(population_size, params=None, rng=None, backend="auto"):
+    """Run the toy model using the kernels of a backend, returning the summary statistics for each time step.
+
+    This is simulate() from infection_toy_model.py with backend= set (and nothing printed or stopped early), so
+    hooks, stop_early and the rest can be used by calling that directly.
+    """
+    return infection_toy_model.simulate(population_size, params, rng, verbose=False, stop_early=False,
+                                        backend=backend)
+
+
+def check_backends_agree(population_size=2000, seed=0, params=None, backends=None):
+    """Run the same simulation with each backend (by default, all the available ones) and check that the results are
+    identical. Returns the names of any backends which disagree with the first one."""
+    backends = backends or available_backends()
+    reference = simulate(population_size, params, np.random.default_rng(seed), backends[0])
+    disagree = []
+    for name in backends[1:]:
+        if simulate(population_size, params, np.random.default_rng(seed), name) != reference:
+            disagree.append(name)
+    return disagree
+
+
+if __name__ == "__main__":
+    backends = available_backends()
+    disagree = check_backends_agree(backends=backends)
+    print("Backends checked:", ", ".join(backends))
+    print("All agree?", not disagree, "" if not disagree else f"(different: {', '.join(disagree)})")
+
+    for name in backends:
+        size = 10_000 if name == "python" else 1_000_000
+        get_backend(name)
+        simulate(100, backend=name)  # make sure any compilation is done before timing
+        start = clock.perf_counter()
+        simulate(size, backend=name)
+        print(f"{name}: {size:,} people in {clock.perf_counter() - start:.2f} s")
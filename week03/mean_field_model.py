@@ -0,0 +1,162 @@
+# A deterministic ("mean-field") version of the toy model.
+# Instead of simulating individual people, this follows the expected number of people in each state, grouped by
+# their number of contacts k:
+# - S[k], the expected number of people with k contacts who have never been infected
+# - the expected number of people with k contacts infected at each time step, so that we know how long each has been
+#   infected and when they will recover (after duration_of_infectivity steps, as in infection_toy_model.py)
+# At each step the prevalence in contacts is worked out from the expected counts, and a susceptible person with k
+# contacts is infected with the expected probability 1 - (1 - prevalence * rate_per_infected_contact)**k (the
+# chance that none of their contacts is both infected and passes on infection).
+#
+# The steps are the same as in simulate(): the first person is infected at time 0 (with the average number of
+# contacts), and from time 1 the prevalence in contacts comes from the population itself, so, as in simulate(),
+# initial_prevalence_in_contacts is not used. The model's results are the expected counts, so they are not whole
+# numbers and never die out by chance: they are closest to the average of the stochastic runs in which the epidemic
+# takes off.
+#
+# Because there is no randomness and only a few dozen contact numbers to follow, one run takes under a
+# millisecond, and mean_field_batch() runs thousands of parameter points together (about 20 microseconds each). This is
+# useful for screening parameter values (for example a ConfigTable from config_class_example.py) before running the
+# full model for the interesting ones.
+
+import numpy as np
+
+from infection_toy_model import Parameters
+
+
+def _poisson_pmf(mean, max_count):
+    """P(k) for k = 0 to max_count for Poisson distributions with each of the given means (one row per mean),
+    renormalised so each row adds up to 1."""
+    k = np.arange(max_count + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(k[1:]))])
+    mean = np.asarray(mean, dtype=float)[:, None]
+    pmf = np.exp(k * np.log(mean) - mean - log_factorial)
+    return pmf / pmf.sum(axis=1, keepdims=True)
+
+
+def mean_field_batch(population_size, rate_per_infected_contact, duration_of_infectivity, contact_number_parameter,
+                     simulation_time):
+    """Run the mean-field model for many parameter points at once.
+
+    Each argument except simulation_time can be a number or an array with one entry per parameter point. Returns a
+    dictionary mapping each statistic from summarise() to an array of shape (parameter points, simulation_time).
+    """
+    population_size, rate, duration, contact_number = np.broadcast_arrays(
+        np.asarray(population_size, dtype=float), np.asarray(rate_per_infected_contact, dtype=float),
+        np.asarray(duration_of_infectivity, dtype=np.int64), np.asarray(contact_number_parameter, dtype=float),
+    )
+    population_size, rate, duration, contact_number = (
+        np.atleast_1d(population_size), np.atleast_1d(rate), np.atleast_1d(duration), np.atleast_1d(contact_number)
+    )
+    points = len(population_size)
+    points_index = np.arange(points)
+
+    # Contact numbers beyond this are so unlikely (less than about one in a billion) they can be left out
+    largest_mean = contact_number.max(initial=0)
+    max_contacts = int(largest_mean + 7 * np.sqrt(largest_mean) + 8)
+    contacts = np.arange(max_contacts + 1)
+    pmf = _poisson_pmf(contact_number, max_contacts)
+    total_contacts = population_size * (pmf @ contacts)
+
+    # recent_infections[t % longest] is the expected number of people with each contact number infected at time t,
+    # kept until they recover (so only the last `longest` steps are needed)
+    longest = int(duration.max(initial=1))
+    recent_infections = np.zeros((longest, points, max_contacts + 1))
+    recent_infections[0] = pmf  # the first person, with the distribution of contact numbers
+    susceptible = (population_size[:, None] - 1) * pmf
+    infected = pmf.copy()
+
+    results = {name: np.empty((points, simulation_time)) for name in
+               ("contacts", "contacts_if_infected", "infected", "new_infections")}
+
+    def record(t, new_infections):
+        results["contacts"][:, t] = total_contacts
+        results["contacts_if_infected"][:, t] = infected @ contacts
+        results["infected"][:, t] = infected.sum(axis=1)
+        results["new_infections"][:, t] = new_infections.sum(axis=1)
+
+    record(0, recent_infections[0])
+    for t in range(1, simulation_time):
+        prevalence_in_contacts = results["contacts_if_infected"][:, t - 1] / total_contacts
+
+        # People infected duration_of_infectivity steps ago recover
+        infected_at = t - duration
+        recovering = infected_at >= 0
+        if recovering.all():
+            infected -= recent_infections[infected_at % longest, points_index]
+        elif recovering.any():
+            infected[recovering] -= recent_infections[infected_at[recovering] % longest, points_index[recovering]]
+
+        # (1 - x)**k is worked out as exp(k * log(1 - x)), which is much quicker than a power for whole arrays
+        prob_infection = -np.expm1(np.log1p(-prevalence_in_contacts * rate)[:, None] * contacts)
+        new_infections = susceptible * prob_infection
+        susceptible -= new_infections
+        infected += new_infections
+        recent_infections[t % longest] = new_infections
+        record(t, new_infections)
+
+    results["prevalence_in_contacts"] = results["contacts_if_infected"] / results["contacts"]
+    results["overall prevalence"] = results["infected"] / population_size[:, None]
+    return results
+
+
+def mean_field(population_size, params=None):
+    """Run the mean-field model for one set of parameters (by default, the toy model's).
+
+    Returns a list with a dictionary of statistics for each time step, like simulate() in infection_toy_model.py
+    (but with expected values, which are not whole numbers).
+    """
+    params = params if params is not None else Parameters()
+    batch = mean_field_batch(population_size, params.rate_per_infected_contact, params.duration_of_infectivity,
+                             params.contact_number_parameter, params.simulation_time)
+    series = {key: values[0].tolist() for key, values in batch.items()}
+    return [{key: values[t] for key, values in series.items()} for t in range(params.simulation_time)]
+
+
+def mean_field_configs(configs):
+    """Run the mean-field model for every row of a ConfigTable (or for a list of Configs).
+
+    Returns the same dictionary as mean_field_batch, with one row per config; steps after a config's own
+    simulation_time are nan.
+    """
+    if not hasattr(configs, "columns"):
+        from config_class_example import ConfigTable
+        configs = ConfigTable.from_configs(configs)
+    columns = configs.columns()
+    simulation_time = int(columns["simulation_time"].max(initial=1))
+    results = mean_field_batch(columns["population_size"], columns["rate_per_infected_contact"],
+                               columns["infectious_period"], columns["contact_number_parameter"], simulation_time)
+    after_end = np.arange(simulation_time) >= columns["simulation_time"][:, None]
+    for values in results.values():
+        values[after_end] = np.nan
+    return results
+
+
+if __name__ == "__main__":
+    import time as clock
+
+    from batched_model import simulate_batch
+
+    # Compare with the average of many runs of the stochastic model
+    params = Parameters()
+    expected = mean_field(1000, params)
+    runs = simulate_batch(2000, 1000, params, np.random.default_rng(1))
+    took_off = runs["new_infections"].sum(axis=1) > 10
+    print("Time  mean-field infected  stochastic mean (runs which took off)")
+    for t in range(params.simulation_time):
+        print(f"{t:>4} {expected[t]['infected']:>20.1f} {runs['infected'][took_off, t].mean():>20.1f}")
+
+    start = clock.perf_counter()
+    for _ in range(1000):
+        mean_field(1000, params)
+    print(f"One run: {(clock.perf_counter() - start) * 1000:.0f} microseconds")
+
+    n_points = 10_000
+    rng = np.random.default_rng(2)
+    start = clock.perf_counter()
+    screen = mean_field_batch(1000, rng.uniform(0.05, 0.4, n_points), rng.integers(1, 5, n_points),
+                              rng.uniform(2, 12, n_points), params.simulation_time)
+    elapsed = clock.perf_counter() - start
+    print(f"{n_points:,} parameter points: {elapsed:.3f} s ({elapsed / n_points * 1e6:.1f} microseconds each)")
+    print(f"Points where more than half are ever infected: "
+          f"{np.count_nonzero(screen['new_infections'].sum(axis=1) > 500):,}")
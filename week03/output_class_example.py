@@ -8,12 +8,30 @@
 # the population.
 
 import numpy as np
-import matplotlib.pyplot as plt
 
 # we'll need to use the Person class from our toy model in order to get a population going
 from infection_toy_model import Person
 
 
+# The statistics an Output can calculate. Each one is a function which takes the population and returns a number.
+# A Population (see infection_toy_model.py) already keeps a running count of infected people; for a plain list of
+# Person objects we have to count them.
+def count_infected(population):
+    if hasattr(population, "aggregates"):
+        return population.aggregates.infected
+    return sum(person.infected for person in population)
+
+
+def overall_prevalence(population):
+    return count_infected(population) / len(population)
+
+
+default_statistics = {
+    "infected": count_infected,
+    "overall prevalence": overall_prevalence,
+}
+
+
 # The Output class will contain all the methods to calculate output statistics, as well as storing that data.
 # The output class can be linked to a population so that we don't have to keep passing a population into it
 # when we want to calculate summary statistics.
@@ -23,51 +41,77 @@ class Output:
     population_size: int
 
     # When the Output is initialised, we assign a population that it is going to track
+    # The statistics map each name to the function which calculates it, or to None for a statistic which is calculated
+    # somewhere else and passed to record() instead.
     # We also pass in the length of the simulation so that it knows how big to make the output table, which
-    # it then creates.
-    def __init__(self, population, sim_time):
+    # it then creates. The table is a NumPy array with one row per statistic and one column per time step, so the
+    # whole time series for a statistic is a single row: output["infected"] gives it to us without copying anything.
+    # Time steps which have not been calculated yet are NaN.
+    def __init__(self, population, sim_time, statistics=None):
         self.population = population
         self.population_size = len(population)
-        self.results = [{}]*sim_time
+        self.statistics = dict(statistics if statistics is not None else default_statistics)
+        self.rows = {name: row for row, name in enumerate(self.statistics)}
+        self.results = np.full((len(self.statistics), sim_time), np.nan)
         self.total_time = sim_time
 
-    # This calculates the summary statistics (not all of them have been included here!)
+    # This calculates the summary statistics
     # This uses the population which has already been set and takes a time step, which
-    # tells it which row of the output table needs to be updated.
+    # tells it which column of the output table needs to be updated.
     def update_results(self, time_step):
-        current_stats = {
-            "infected": sum(person.infected for person in self.population),
-        }
-        current_stats["overall prevalence"] = current_stats["infected"] / self.population_size
-        self.results[time_step] = current_stats
+        for row, calculate in enumerate(self.statistics.values()):
+            if calculate is not None:
+                self.results[row, time_step] = calculate(self.population)
+
+    # If the statistics have already been calculated together (e.g. by summarise() in the toy model), we can write
+    # them into the table for a time step directly, rather than calculating each one again
+    def record(self, time_step, values):
+        for name, row in self.rows.items():
+            self.results[row, time_step] = values[name]
+
+    def __getitem__(self, output_key):
+        """The time series for one statistic (a view of the output table, not a copy)."""
+        return self.results[self.rows[output_key]]
+
+    def save_npz(self, filename):
+        """Save every time series to a .npz file, one array per statistic."""
+        np.savez(filename, **{name: self[name] for name in self.statistics})
+
+    def save_npy(self, filename):
+        """Save the whole output table to a .npy file.
+
+        The file can be opened without reading it into memory with np.load(filename, mmap_mode="r"); the rows are
+        in the same order as self.statistics.
+        """
+        np.save(filename, self.results)
 
     # Creating a plotting method in the output class which takes a key makes it easy to plot
     # whatever different outputs you need, without repeating lots of boiler-plate code
+    # (The plotting code itself is in plotting.py, which is only loaded the first time something is plotted.)
     def plot(self, output_key):
-        time_steps = range(self.total_time)
-        output_stats = [row[output_key] for row in self.results]
-        plt.plot(time_steps, output_stats)
-        plt.xlabel("Time step")
-        plt.ylabel(output_key)
-        plt.show()
-
-
-# Let's make a population to start and make an output object to track it
-sim_time = 10
-population = [Person() for _ in range(1000)]
-outputs = Output(population, sim_time)  # defines our Output and assigns the population we just created to it
-# run a simulation
-for t in range(0, sim_time):
-    # toy update for illustration; this could be replaced by the actual update steps if you want
-    for person in population:
-        if np.random.uniform() < 0.2:
-            person.infected = True
-
-    # update results at each step
-    # Just needs the time; even though the population data has changed, the Output class has a reference to it
-    # so when it calculates the stats, its population data will up to date automatically.
-    outputs.update_results(t)
-
-# Once the simulation loop is done, we can now trivially print the data or plot graphs.
-# If we wanted to do this somewhere else, we can just pass the Output object around, and everything is there!
-outputs.plot("overall prevalence")
\ No newline at end of file
+        import plotting
+        plotting.plot_output(self, output_key)
+
+
+# The example below only runs when this file is run as a script, so that other code (like the Simulation class in
+# class_exercise.py) can import the Output class without running it.
+if __name__ == "__main__":
+    # Let's make a population to start and make an output object to track it
+    sim_time = 10
+    population = [Person() for _ in range(1000)]
+    outputs = Output(population, sim_time)  # defines our Output and assigns the population we just created to it
+    # run a simulation
+    for t in range(0, sim_time):
+        # toy update for illustration; this could be replaced by the actual update steps if you want
+        for person in population:
+            if np.random.uniform() < 0.2:
+                person.infected = True
+
+        # update results at each step
+        # Just needs the time; even though the population data has changed, the Output class has a reference to it
+        # so when it calculates the stats, its population data will up to date automatically.
+        outputs.update_results(t)
+
+    # Once the simulation loop is done, we can now trivially print the data or plot graphs.
+    # If we wanted to do this somewhere else, we can just pass the Output object around, and everything is there!
+    outputs.plot("overall prevalence")
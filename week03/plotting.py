@@ -0,0 +1,60 @@
+# Plotting for the toy model and its outputs.
+# Plotting is kept separate from the model code (infection_toy_model.py, output_class_example.py) because importing
+# matplotlib is slow and uses a lot of memory. The model only imports this file the first time something is actually
+# plotted, so code which never plots - such as the worker processes started by ensemble_runner.py - never pays for it.
+
+import matplotlib.pyplot as plt
+
+
+def plot_results(results):
+    times = range(0, len(results))
+    tick = 2
+
+    plt.plot(times, [result["infected"] for result in results], 'x-', label='Total active')
+    plt.plot(times, [result["new_infections"] for result in results], 'o-', label='New')
+    plt.xticks(range(0, len(results), tick))
+    plt.xlabel("Time")
+    plt.ylabel("Number")
+    plt.title("Infections")
+    plt.legend()
+    plt.show()
+
+    plt.plot(times, [result["prevalence_in_contacts"]*100 for result in results], 'x-', label="Prevalence in Contacts")
+    plt.plot(times, [result["overall prevalence"]*100 for result in results], 'o-', label="Overall Prevalence")
+    plt.title("Prevalence of Infection")
+    plt.ylabel("Prevalence %")
+    plt.xlabel("Time")
+    plt.xticks(range(0, len(results), tick))
+    plt.legend()
+    plt.show()
+
+
+def plot_output(output, output_key):
+    """Plot the time series of one statistic from an Output object (see output_class_example.py)."""
+    time_steps = range(output.total_time)
+    plt.plot(time_steps, output[output_key])
+    plt.xlabel("Time step")
+    plt.ylabel(output_key)
+    plt.show()
+
+
+def plot_ensemble_summary(summary, key, x=None, label=None):
+    """Plot the median and quantile bands of one statistic from an EnsembleSummary (see ensemble_summary.py).
+
+    The quantiles are paired from the outside in (e.g. 5% with 95%, then 25% with 75%) to make nested bands.
+    """
+    if x is None:
+        x = range(summary.length)
+    quantiles = sorted(summary.quantiles)
+    for i in range(len(quantiles) // 2):
+        lower, upper = quantiles[i], quantiles[-1 - i]
+        plt.fill_between(x, summary.quantile(key, lower), summary.quantile(key, upper), color="C0",
+                         alpha=0.2, linewidth=0, label=f"{lower:.0%} to {upper:.0%}")
+    if 0.5 in summary.quantiles:
+        plt.plot(x, summary.median(key), color="C0", label="Median")
+    plt.plot(x, summary.mean(key), "--", color="C1", label="Mean")
+    plt.xlabel(label or "Time step")
+    plt.ylabel(key)
+    plt.title(f"{key} over {summary.count} runs")
+    plt.legend()
+    plt.show()
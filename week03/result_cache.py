@@ -0,0 +1,98 @@
+# An on-disk cache of simulation results.
+# A run of the toy model is completely determined by its Config and its seed, so there is no need to run the same
+# (config, seed) pair twice. The cache stores the results of each run in a directory, in a file named after a hash of
+# the config's canonical form (see Config.to_json in config_class_example.py), the seed and the model version. When an
+# ensemble is run again (see run_ensemble in ensemble_runner.py), only the configurations which are new or have
+# changed need to be simulated.
+#
+# The cache has a maximum size. When it grows beyond this, the results which were least recently used are deleted
+# (each time a result is read its file's modification time is updated, so the oldest file is the least recently used).
+#
+# For example:
+#   cache = ResultCache("results_cache", max_bytes=10**9)
+#   ensemble = run_ensemble(cfg_list, seed=42, cache=cache)
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Change this whenever the model changes in a way which changes its results, so that old results are not reused
+model_version = 1
+
+
+def seed_description(seed):
+    """A JSON-friendly description of a seed: an integer, or the entropy and spawn key of a np.random.SeedSequence."""
+    if isinstance(seed, np.random.SeedSequence):
+        return {"entropy": seed.entropy, "spawn_key": list(seed.spawn_key)}
+    return seed
+
+
+def result_key(config, seed):
+    """The name under which the results of running `config` with `seed` are stored."""
+    description = {"config": config.to_dict(), "seed": seed_description(seed), "model_version": model_version}
+    return hashlib.sha256(json.dumps(description, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory, max_bytes=2**30):
+        """A cache of results in `directory` (created if needed), holding at most max_bytes of results."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """The results stored under `key`, as a dictionary of arrays, or None if there are none."""
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as stored:
+                results = {name: stored[name] for name in stored.files}
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # mark the result as recently used
+        return results
+
+    def put(self, key, results, evict=True):
+        """Store a dictionary of arrays under `key`, then remove old results if the cache is too big.
+
+        When storing many results at once, pass evict=False and call evict() once at the end instead.
+        """
+        # Write to a temporary file first, so that an interrupted write never leaves a broken result behind
+        temporary_path = self.path(key) + ".tmp"
+        with open(temporary_path, "wb") as f:
+            np.savez(f, **results)
+        os.replace(temporary_path, self.path(key))
+        if evict:
+            self.evict()
+
+    def entries(self):
+        """(modification time, size, path) of each stored result, least recently used first."""
+        entries = []
+        with os.scandir(self.directory) as files:
+            for entry in files:
+                if entry.name.endswith(".npz"):
+                    info = entry.stat()
+                    entries.append((info.st_mtime, info.st_size, entry.path))
+        return sorted(entries)
+
+    def size(self):
+        """The total size of the stored results, in bytes."""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Delete the least recently used results until the cache is no bigger than max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
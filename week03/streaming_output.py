@@ -0,0 +1,128 @@
+# Writing the results of a simulation to a file while it runs.
+# simulate() normally keeps the statistics for every time step in a list until the end of the run. For very long runs
+# (or many runs in one process) it is better to write each step out as soon as it has been calculated and keep
+# nothing. Writing to a file is slow compared with a time step of a small population, so StreamingWriter does the
+# writing in a background thread: the simulation only puts each step's statistics on a queue and carries on, while the
+# writer thread takes them off the queue and appends them to the file. The queue has a maximum size, so if the
+# writing falls behind the simulation waits for it rather than using more and more memory.
+#
+# StreamingWriter is a hook (see instrumentation.py), so it is given to simulate() like any other hook:
+#   with StreamingWriter("results.csv", progress=lambda steps, time: print(steps, "steps written")) as writer:
+#       simulate(population_size, verbose=False, hooks=[writer], keep_results=False)
+#
+# Two file formats are supported:
+# - "csv": a header line, then one line per time step (the file can be read while it is still being written)
+# - "npy": a sequence of NumPy arrays appended to one file, the first holding the column names and each of the others
+#   a chunk of rows; read_npy_chunks() reads them back into one array per column
+
+import csv
+import queue
+import threading
+
+import numpy as np
+
+from instrumentation import Hook
+
+_finished = object()  # put on the queue to tell the writer thread to stop
+
+
+class StreamingWriter(Hook):
+    def __init__(self, filename, file_format=None, queue_size=1000, chunk_size=1000, progress=None):
+        """Write the statistics from each time step to `filename` using a background thread.
+
+        file_format is "csv" or "npy" (by default, taken from the file name). At most queue_size steps wait on the
+        queue, and at most chunk_size steps are written at once. progress, if given, is called from the writer thread
+        after each chunk is written, with the number of steps written so far and the time of the last of them.
+        """
+        if file_format is None:
+            file_format = "npy" if filename.endswith(".npy") else "csv"
+        if file_format not in ("csv", "npy"):
+            raise ValueError(f"Unknown file format {file_format!r}; choose from 'csv' or 'npy'")
+        self.filename = filename
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.columns = None  # "time" and the statistics, in the order of the first step written
+        self.steps_written = 0
+        self.error = None  # an exception raised in the writer thread, raised again by close()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        if file_format == "csv":
+            self._file = open(filename, "w", newline="")
+        else:
+            self._file = open(filename, "wb")
+        self._thread = threading.Thread(target=self._write_all, daemon=True)
+        self._thread.start()
+
+    def end_step(self, population, time, stats):
+        self.write(time, stats)
+
+    def write(self, time, stats):
+        """Queue the statistics for one time step to be written (waiting if the queue is full)."""
+        self._queue.put((time, dict(stats)))
+
+    def close(self):
+        """Wait for everything on the queue to be written, then close the file."""
+        if self._thread.is_alive():
+            self._queue.put(_finished)
+            self._thread.join()
+            self._file.close()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def report(self):
+        return {"filename": self.filename, "steps_written": self.steps_written}
+
+    def _write_all(self):
+        # The writer thread: take steps off the queue, as many as are waiting (up to chunk_size), and write them
+        finished = False
+        while not finished:
+            chunk = [self._queue.get()]
+            while len(chunk) < self.chunk_size and chunk[-1] is not _finished:
+                try:
+                    chunk.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if chunk[-1] is _finished:
+                chunk.pop()
+                finished = True
+            if chunk and self.error is None:
+                # After an error, keep emptying the queue (so the simulation is never left waiting) but write nothing
+                try:
+                    self._write_chunk(chunk)
+                except Exception as error:
+                    self.error = error
+
+    def _write_chunk(self, chunk):
+        if self.columns is None:
+            self.columns = ["time"] + list(chunk[0][1])
+            if self.file_format == "csv":
+                csv.writer(self._file).writerow(self.columns)
+            else:
+                np.save(self._file, np.array(self.columns))
+        rows = [[time] + [stats[name] for name in self.columns[1:]] for time, stats in chunk]
+        if self.file_format == "csv":
+            csv.writer(self._file).writerows(rows)
+        else:
+            np.save(self._file, np.array(rows, dtype=float))
+        self._file.flush()
+        self.steps_written += len(chunk)
+        if self.progress is not None:
+            self.progress(self.steps_written, chunk[-1][0])
+
+
+def read_npy_chunks(filename):
+    """Read a file written by StreamingWriter in "npy" format, returning a dictionary of one array per column."""
+    with open(filename, "rb") as f:
+        columns = [str(name) for name in np.load(f)]
+        chunks = []
+        while f.peek(1):  # until the end of the file
+            chunks.append(np.load(f))
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(columns)))
+    return {name: data[:, i] for i, name in enumerate(columns)}